@@ -0,0 +1,140 @@
+# Times each ImageProcessing function on synthetic wheel frames and saves the results as JSON so runs can be compared
+# e.g. "python benchmark_suite.py --output before.json" then after a change "python benchmark_suite.py --compare before.json"
+import argparse
+# Used to save and compare results
+import json
+# Used to record which machine and versions the results came from
+import platform
+import time
+import cv2
+import numpy as np
+from image_processing import ImageProcessing
+from frame_analysis import FrameAnalysis
+from segmentation import HSVLookupTable, in_hsv_range
+from synthetic_frames import SyntheticSource, SYNTHETIC_RANGES
+
+# Function that runs "function" repeats times (after a few untimed runs) and returns statistics of the times in milliseconds
+def time_function(function, repeats, warm_up=5):
+    for _ in range(warm_up):
+        function()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    times = np.array(times)
+    return {
+        "mean_ms": float(times.mean()),
+        "median_ms": float(np.median(times)),
+        "min_ms": float(times.min()),
+        "p95_ms": float(np.percentile(times, 95)),
+        "repeats": repeats,
+    }
+
+# Function that returns a copy of the latest FrameAnalysis with nothing worked out yet
+# (FrameAnalysis remembers its results, so without this only the first run of each function would do any work)
+def fresh_analysis(image_processor):
+    analysis = image_processor.analysis
+    image_processor.analysis = FrameAnalysis(analysis.image_BGR, analysis.label_image, timestamp=analysis.timestamp,
+                                             search_window=analysis.search_window,
+                                             radius_threshold=analysis.radius_threshold, direction_threshold=analysis.direction_threshold)
+    return image_processor.analysis
+
+# Function that times every ImageProcessing function at one resolution and noise level
+def benchmark(width, height, noise, repeats, settings):
+    source = SyntheticSource(width, height, noise=noise)
+    image_processor = ImageProcessing(source=source, analysis_scale=settings["analysis_scale"], roi_tracking=settings["roi_tracking"])
+    image_processor.lookup_table = HSVLookupTable(SYNTHETIC_RANGES)
+    lower, upper = SYNTHETIC_RANGES[0]
+    results = {}
+
+    results["calibration_frame"] = time_function(lambda: image_processor.calibration_frame(lower, upper), repeats)
+    # Finding the pixels of the 4 colours in a whole frame: the lookup table against the 4 inRange calls it replaced
+    image_HSV = cv2.cvtColor(source.frames[0], cv2.COLOR_BGR2HSV)
+    results["segmentation_lookup_table"] = time_function(lambda: image_processor.lookup_table.label(image_HSV), repeats)
+    results["segmentation_in_range"] = time_function(lambda: [in_hsv_range(image_HSV, lower, upper) for lower, upper in SYNTHETIC_RANGES], repeats)
+
+    # Only finds the pixels of each colour, the rest is worked out when it is first needed
+    results["play_frame"] = time_function(lambda: image_processor.play_frame(*SYNTHETIC_RANGES), repeats)
+
+    # Each of these starts from a frame with nothing worked out yet, so they include the work they depend on (e.g. the masks)
+    def contours():
+        fresh_analysis(image_processor)
+        return image_processor.find_contours()
+    results["find_contours"] = time_function(contours, repeats)
+
+    contour_list = image_processor.find_contours()
+    if len(contour_list[0]) > 0:
+        results["find_radius_and_centre"] = time_function(lambda: image_processor.find_radius_and_centre(contour_list[0]), repeats)
+
+    for name in ["check_acceleration", "check_braking", "check_direction"]:
+        def check(name=name):
+            fresh_analysis(image_processor)
+            return getattr(image_processor, name)()
+        results[name] = time_function(check, repeats)
+
+    # Everything the play window does for each frame: find the colours then make all 3 decisions
+    def full_frame():
+        analysis = image_processor.play_frame(*SYNTHETIC_RANGES)
+        return analysis.direction, analysis.braking, analysis.accelerating
+    results["full_frame"] = time_function(full_frame, repeats)
+
+    image_processor.cap.release()
+    return results
+
+# Function that returns details of this machine so results from different machines can be told apart
+def machine_info():
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+# Function that prints each result next to the same result from an earlier run
+def compare(results, previous):
+    print("Benchmark".ljust(45) + "Before (ms)".rjust(12) + "Now (ms)".rjust(10) + "Change".rjust(9))
+    for size, benchmarks in results["results"].items():
+        for name, values in benchmarks.items():
+            old = previous["results"].get(size, {}).get(name)
+            if old is None:
+                continue
+            change = (values["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0.0
+            print((size + " " + name).ljust(45) + ("%.3f" % old["median_ms"]).rjust(12) + ("%.3f" % values["median_ms"]).rjust(10) + ("%+.1f%%" % change).rjust(9))
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the image processing functions on synthetic frames")
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1280x720"], help="frame sizes as WIDTHxHEIGHT")
+    parser.add_argument("--noise", type=float, default=8.0, help="standard deviation of the noise added to the frames")
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--analysis-scale", type=float, default=1.0)
+    parser.add_argument("--roi-tracking", action="store_true")
+    parser.add_argument("--output", metavar="PATH", help="save the results to a JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="JSON file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    settings = {"analysis_scale": args.analysis_scale, "roi_tracking": args.roi_tracking}
+    results = {
+        "machine": machine_info(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "settings": dict(settings, noise=args.noise, repeats=args.repeats),
+        "results": {},
+    }
+    for size in args.sizes:
+        width, height = (int(value) for value in size.lower().split("x"))
+        results["results"][size] = benchmark(width, height, args.noise, args.repeats, settings)
+        for name, values in results["results"][size].items():
+            print((size + " " + name).ljust(45) + ("%.3f ms" % values["median_ms"]).rjust(12))
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+if __name__ == "__main__":
+    main()
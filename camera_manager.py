@@ -0,0 +1,170 @@
+# Used to share the camera between windows and to close it after it has not been used for a while
+import threading
+# Classes used to open a camera and read it on a background thread
+from frame_sources import CameraSource, ThreadedCapture, DEFAULT_CAPTURE_SETTINGS
+
+# Class that opens each camera once and shares its frames with everything that needs them
+# Cameras are counted as they are acquired and released, and are kept open ("warm") for a while after the last user
+# releases them, so going from the calibration window to a play window that does its image processing in this process
+# (vision_process off in gui.py) does not have to open the camera again
+# A camera can only be shared within one process: a worker process (see vision_worker.py) opens the camera itself,
+# so the warm camera has to be closed (close_idle) before the worker starts
+class CameraManager:
+
+    # keep_warm is how many seconds a camera stays open after it is no longer used (None to keep it open until close_all)
+    def __init__(self, keep_warm=30.0):
+        self.keep_warm = keep_warm
+        # ThreadedCapture, capture settings, number of users and close timer of each open camera, by camera index
+        self.captures = {}
+        self.settings = {}
+        self.users = {}
+        self.timers = {}
+        # Event of each camera that is being opened, set once it has been (so other threads wait for it instead of opening it too)
+        self.opening = {}
+        self.lock = threading.Lock()
+
+    # Function that returns a CameraHandle for a camera, opening the camera only if it is not already open
+    # timeout is how long the handle's "read" waits for a new frame by default
+    # settings are the capture settings (see frame_sources.py), which can only be changed while nothing else is using the camera
+    def acquire(self, index=0, timeout=0, settings=None):
+        # Missing settings are the driver's defaults, so they can be compared with the settings the camera was opened with
+        full_settings = dict(DEFAULT_CAPTURE_SETTINGS)
+        if settings is not None:
+            full_settings.update(settings)
+        while True:
+            with self.lock:
+                # Stops the camera from being closed if it was waiting to be
+                timer = self.timers.pop(index, None)
+                if timer is not None:
+                    timer.cancel()
+                opened = self.opening.get(index)
+                if opened is None:
+                    capture = self.captures.get(index)
+                    unused = self.users.get(index, 0) == 0
+                    # Opened again if it has never been opened, has stopped working or is unused and needs different settings
+                    if capture is None or not capture.running or (unused and full_settings != self.settings.get(index)):
+                        old_capture = self.captures.pop(index, None)
+                        self.settings.pop(index, None)
+                        opened = threading.Event()
+                        self.opening[index] = opened
+                        break
+                    self.users[index] = self.users.get(index, 0) + 1
+                    return CameraHandle(self, index, capture, timeout)
+            # Another thread is opening this camera, so it is checked again once that has finished
+            opened.wait()
+
+        # Opening a camera can take seconds, so it is done without holding the lock (other cameras can still be used and closed)
+        try:
+            if old_capture is not None:
+                old_capture.release()
+            capture = ThreadedCapture(CameraSource(index, full_settings))
+            with self.lock:
+                self.captures[index] = capture
+                self.settings[index] = full_settings
+                self.users[index] = self.users.get(index, 0) + 1
+                return CameraHandle(self, index, capture, timeout)
+        finally:
+            with self.lock:
+                self.opening.pop(index, None)
+            opened.set()
+
+    # Function called by a CameraHandle when it is released
+    def release(self, index):
+        with self.lock:
+            self.users[index] = max(self.users.get(index, 0) - 1, 0)
+            if self.users[index] > 0 or index not in self.captures:
+                return
+            if self.keep_warm is not None:
+                # Closed later unless it is acquired again before then
+                timer = threading.Timer(self.keep_warm, self.close_if_unused, args=(index,))
+                timer.daemon = True
+                self.timers[index] = timer
+                timer.start()
+
+    # Function that closes a camera if nothing is using it
+    def close_if_unused(self, index):
+        with self.lock:
+            if self.users.get(index, 0) > 0:
+                return
+            self.timers.pop(index, None)
+            capture = self.captures.pop(index, None)
+            self.settings.pop(index, None)
+        if capture is not None:
+            capture.release()
+
+    # Function that closes every camera that is only being kept warm (e.g. before another process opens the camera)
+    def close_idle(self):
+        with self.lock:
+            indexes = [index for index in self.captures if self.users.get(index, 0) == 0]
+        for index in indexes:
+            self.close_if_unused(index)
+
+    # Function that closes every camera, even if they are still being used
+    def close_all(self):
+        with self.lock:
+            for timer in self.timers.values():
+                timer.cancel()
+            self.timers = {}
+            captures = list(self.captures.values())
+            self.captures = {}
+            self.settings = {}
+            self.users = {}
+        for capture in captures:
+            capture.release()
+
+# Class given to each user of a shared camera, which reads like a ThreadedCapture
+# Each handle keeps track of which frames it has seen, so every user gets every new frame (not just the first to ask)
+class CameraHandle:
+
+    def __init__(self, manager, index, capture, timeout=0):
+        self.manager = manager
+        self.index = index
+        self.capture = capture
+        self.timeout = timeout
+        # Time the last frame read was captured at
+        self.timestamp = None
+        # Number of the last frame read (the capture's frames_captured when it was read)
+        self.last_frame = capture.frames_captured
+        # Number of frames the camera captured that this handle never read
+        self.frames_dropped = 0
+        self.released = False
+
+    # False when the camera has stopped working
+    @property
+    def running(self):
+        return self.capture.running
+
+    # Mode the driver actually chose for the camera (see CameraSource.mode)
+    def mode(self):
+        return self.capture.source.mode()
+
+    # Function that works like ThreadedCapture's "read" function
+    def read(self, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        capture = self.capture
+        with capture.condition:
+            if capture.frames_captured == self.last_frame and capture.running and timeout != 0:
+                capture.condition.wait_for(lambda: capture.frames_captured != self.last_frame or not capture.running, timeout)
+            if capture.frames_captured == self.last_frame:
+                return False, None
+            # Frames captured since the last read, apart from this one, were missed
+            self.frames_dropped += capture.frames_captured - self.last_frame - 1
+            self.last_frame = capture.frames_captured
+            self.timestamp = capture.frame_timestamp
+            # The frame is shared with the other handles, so it must not be changed
+            return True, capture.frame
+
+    # Function that stops this handle from using the camera (the camera is closed once no handles are using it)
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.manager.release(self.index)
+
+# Camera manager shared by the whole program
+default_manager = CameraManager()
+
+# Function that returns a CameraHandle for a camera from the shared camera manager
+def acquire_camera(index=0, timeout=0, settings=None):
+    return default_manager.acquire(index, timeout, settings)
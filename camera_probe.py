@@ -0,0 +1,91 @@
+# Used to time the frames
+import time
+# Used to save the results so different cameras can be compared
+import json
+# Class used to open the camera with capture settings
+from frame_sources import CameraSource
+
+# Modes tried by default, from the most common driver default to faster compressed modes
+PROBE_MODES = [
+    {"width": 640, "height": 480, "fps": 30, "fourcc": "YUYV", "buffer_size": None},
+    {"width": 640, "height": 480, "fps": 30, "fourcc": "MJPG", "buffer_size": None},
+    {"width": 640, "height": 480, "fps": 30, "fourcc": "MJPG", "buffer_size": 1},
+    {"width": 640, "height": 480, "fps": 60, "fourcc": "MJPG", "buffer_size": 1},
+    {"width": 320, "height": 240, "fps": 60, "fourcc": "MJPG", "buffer_size": 1},
+    {"width": 1280, "height": 720, "fps": 30, "fourcc": "MJPG", "buffer_size": 1},
+]
+
+# Function that opens the camera in a mode and measures how many frames a second it really gives and how old they are
+# Returns a dictionary of the results, or None if the camera could not be opened
+def probe_mode(index, settings, frame_count=90, warm_up=10):
+    source = CameraSource(index, settings)
+    try:
+        if not source.is_opened():
+            return None
+        # The first frames are often slow while the camera adjusts its exposure
+        for _ in range(warm_up):
+            source.read()
+
+        # Time each read takes (how long it waited for the frame) and when each frame arrived
+        read_times = []
+        arrivals = []
+        for _ in range(frame_count):
+            start = time.perf_counter()
+            ret, _ = source.read()
+            if not ret:
+                break
+            read_times.append(time.perf_counter() - start)
+            arrivals.append(source.timestamp)
+        if len(arrivals) < 2:
+            return None
+        fps = (len(arrivals) - 1) / (arrivals[-1] - arrivals[0])
+
+        # After a pause the driver's buffer is full, so reads that return straight away are frames that were waiting in it
+        # Each of those frames adds one frame interval of lag between something happening and it being seen
+        time.sleep(0.5)
+        buffered_frames = 0
+        for _ in range(10):
+            start = time.perf_counter()
+            source.read()
+            if time.perf_counter() - start > 0.3 / fps:
+                break
+            buffered_frames += 1
+
+        read_ms = 1000 * sum(read_times) / len(read_times)
+        return {
+            "requested": settings,
+            "actual": source.mode(),
+            "fps": fps,
+            "read_ms": read_ms,
+            "buffered_frames": buffered_frames,
+            # Estimated time a frame waits before it is read
+            "latency_ms": buffered_frames * 1000 / fps + read_ms,
+        }
+    finally:
+        source.release()
+
+# Function that probes every mode and returns the results of the modes the camera could be opened in
+def probe_modes(index=0, modes=PROBE_MODES, frame_count=90):
+    results = []
+    for settings in modes:
+        result = probe_mode(index, settings, frame_count)
+        if result is not None:
+            results.append(result)
+    return results
+
+# Probes the webcam when this file is run, e.g. "python camera_probe.py 0 probe.json"
+if __name__ == "__main__":
+    import sys
+
+    index = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    results = probe_modes(index)
+    print("Asked for              Got                    FPS    Buffered  Latency (ms)")
+    for result in results:
+        requested = result["requested"]
+        actual = result["actual"]
+        asked = "%dx%d %s@%d buf %s" % (requested["width"], requested["height"], requested["fourcc"], requested["fps"], requested["buffer_size"])
+        got = "%dx%d %s@%.0f" % (actual["width"], actual["height"], actual["fourcc"], actual["fps"])
+        print(asked.ljust(23) + got.ljust(23) + ("%.1f" % result["fps"]).rjust(5) + str(result["buffered_frames"]).rjust(10) + ("%.1f" % result["latency_ms"]).rjust(14))
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w") as file:
+            json.dump(results, file, indent=4)
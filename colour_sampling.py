@@ -0,0 +1,67 @@
+# Imports numpy for the vectorised percentiles
+import numpy as np
+# Number of possible hues in an OpenCV HSV image (0 to 179)
+from segmentation import HUE_VALUES
+
+# Function that works out lower and upper HSV bounds that contain most of the sampled pixels
+# pixels_HSV is an array of HSV pixels (any shape ending in 3), percentiles are the low and high percentiles kept
+# and margin is how much (hue, saturation, value) is added either side so small changes in lighting are still matched
+# The lower hue can be bigger than the upper hue, meaning the range wraps past 179 back to 0 (e.g. for red markers)
+def estimate_hsv_range(pixels_HSV, percentiles=(5, 95), margin=(5, 30, 30)):
+    pixels = np.asarray(pixels_HSV).reshape(-1, 3).astype(np.int64)
+    if len(pixels) == 0:
+        return None
+
+    # Hue is circular, so it is measured from the end of the largest gap between sampled hues
+    # (red pixels at 178 and 2 are then next to each other instead of at opposite ends of the range)
+    hues = np.unique(pixels[:, 0])
+    gaps = np.diff(np.append(hues, hues[0] + HUE_VALUES))
+    shift = hues[(np.argmax(gaps) + 1) % len(hues)]
+    shifted_hues = (pixels[:, 0] - shift) % HUE_VALUES
+
+    low_hue, high_hue = np.percentile(shifted_hues, percentiles)
+    low_hue = int(np.floor(low_hue)) - margin[0]
+    high_hue = int(np.ceil(high_hue)) + margin[0]
+    # Hues too spread out to be one colour, so every hue is kept
+    if high_hue - low_hue >= HUE_VALUES - 1:
+        lower_hue, upper_hue = 0, HUE_VALUES - 1
+    else:
+        lower_hue = (low_hue + shift) % HUE_VALUES
+        upper_hue = (high_hue + shift) % HUE_VALUES
+
+    # Saturation and value are not circular, so their percentiles are clipped to 0 to 255
+    low_sv, high_sv = np.percentile(pixels[:, 1:], percentiles, axis=0)
+    lower_sv = np.clip(np.floor(low_sv) - margin[1:], 0, 255).astype(int)
+    upper_sv = np.clip(np.ceil(high_sv) + margin[1:], 0, 255).astype(int)
+
+    lower_bound = np.array([lower_hue, lower_sv[0], lower_sv[1]])
+    upper_bound = np.array([upper_hue, upper_sv[0], upper_sv[1]])
+    return lower_bound, upper_bound
+
+# Class that collects the pixels of a marker from a region of several frames, so one noisy frame does not decide the range
+class ColourSampler:
+
+    # region is (x0, y0, x1, y1) in frame pixels and frame_count is how many frames are sampled
+    def __init__(self, region, frame_count=10):
+        self.region = region
+        self.frame_count = frame_count
+        self.samples = []
+
+    # True once enough frames have been sampled
+    @property
+    def done(self):
+        return len(self.samples) >= self.frame_count
+
+    # Function that stores the pixels inside the region of an HSV frame
+    def add(self, image_HSV):
+        if self.done:
+            return
+        x0, y0, x1, y1 = self.region
+        # Copied as the frame may be reused for the next one
+        self.samples.append(image_HSV[y0:y1, x0:x1].reshape(-1, 3).copy())
+
+    # Function that returns the (lower bound, upper bound) of the sampled pixels, or None if nothing was sampled
+    def bounds(self):
+        if not self.samples:
+            return None
+        return estimate_hsv_range(np.concatenate(self.samples))
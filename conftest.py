@@ -0,0 +1,6 @@
+# Lets the tests in tests/ import the program's modules (e.g. "import frame_scheduler") when run with "pytest",
+# which unlike "python -m pytest" does not add the current folder to the import path
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,114 @@
+# Used to time how long each decision has been held if frames have no timestamp
+import time
+# Colour indices used to measure the markers
+from frame_analysis import DIR1, DIR2, BRAKE, ACC
+
+# Settings used if they are not given to the DecisionFilter
+# The bands are fractions of the thresholds: a control turns on above threshold * (1 + band) and only turns off again
+# below threshold * (1 - band), so a marker sitting near the threshold does not switch it on and off every frame
+# min_hold is the shortest time (in seconds) each control keeps a new state before it can change again
+DEFAULT_FILTER_SETTINGS = {
+    "radius_band": 0.2,
+    "direction_band": 0.25,
+    "min_hold": {"direction": 0.05, "braking": 0.05, "accelerating": 0.05},
+}
+
+# Class for one control that keeps its state for at least min_hold seconds after it changes
+# A change that is wanted while the state is being held is made as soon as the hold ends (if it is still wanted),
+# so a change is never delayed by more than min_hold plus one frame
+class HeldState:
+
+    def __init__(self, state, min_hold):
+        self.state = state
+        self.min_hold = min_hold
+        # Time the state last changed (None so the first change is never held back)
+        self.changed_at = None
+        # Number of times the state changed
+        self.transitions = 0
+
+    # Function that changes to the wanted state unless the current state is still being held, and returns the state
+    def update(self, wanted, now):
+        if wanted != self.state and (self.changed_at is None or now - self.changed_at >= self.min_hold):
+            self.state = wanted
+            self.changed_at = now
+            self.transitions += 1
+        return self.state
+
+# Class that turns the measurements of each frame into steady decisions for the outputs
+# Each control has its own hysteresis band and minimum hold time, and the number of changes that were
+# smoothed away (compared to deciding each frame on its own, like FrameAnalysis does) is counted
+class DecisionFilter:
+
+    # settings is a dictionary like DEFAULT_FILTER_SETTINGS, stats is a LatencyStats (see latency.py) to report suppressed changes in
+    def __init__(self, settings=None, stats=None):
+        self.settings = dict(DEFAULT_FILTER_SETTINGS)
+        if settings is not None:
+            self.settings.update(settings)
+        min_hold = dict(DEFAULT_FILTER_SETTINGS["min_hold"])
+        min_hold.update(self.settings["min_hold"])
+        self.stats = stats
+
+        self.direction = HeldState("Contour(s) missing", min_hold["direction"])
+        self.braking = HeldState(False, min_hold["braking"])
+        self.accelerating = HeldState(False, min_hold["accelerating"])
+
+        # Decisions made from each frame on its own, and how many times they changed
+        self.raw_decisions = None
+        self.raw_transitions = 0
+
+    # Longest time (in seconds) the filter can delay a change, not counting the frame it is made on
+    @property
+    def max_added_latency(self):
+        return max(self.direction.min_hold, self.braking.min_hold, self.accelerating.min_hold)
+
+    # Number of changes that the frames on their own would have made but the filter did not
+    @property
+    def suppressed_transitions(self):
+        output_transitions = self.direction.transitions + self.braking.transitions + self.accelerating.transitions
+        return max(self.raw_transitions - output_transitions, 0)
+
+    # Function that returns True if a marker's radius is past the threshold, using the band to make it harder to change state
+    def radius_past_threshold(self, analysis, colour_index, currently_shown):
+        measurement = analysis.measure(colour_index)
+        if measurement is None:
+            return False
+        band = self.settings["radius_band"] if currently_shown else -self.settings["radius_band"]
+        return measurement[0] > analysis.radius_threshold * (1 - band)
+
+    # Function that works out the direction from the direction markers, using the band to make it harder to change direction
+    def wanted_direction(self, analysis):
+        current = self.direction.state
+        markers_shown = current != "Contour(s) missing"
+        if not (self.radius_past_threshold(analysis, DIR1, markers_shown) and self.radius_past_threshold(analysis, DIR2, markers_shown)):
+            return "Contour(s) missing"
+        dir1_centre = analysis.measure(DIR1)[1]
+        dir2_centre = analysis.measure(DIR2)[1]
+        # Positive when the top colour is left of the bottom colour (steering left)
+        offset = dir2_centre[0] - dir1_centre[0]
+        band = analysis.direction_threshold * self.settings["direction_band"]
+        # Harder to start turning (threshold + band) than to keep turning (threshold - band)
+        left_threshold = analysis.direction_threshold - band if current == "LEFT" else analysis.direction_threshold + band
+        right_threshold = analysis.direction_threshold - band if current == "RIGHT" else analysis.direction_threshold + band
+        if offset > left_threshold:
+            return "LEFT"
+        elif -offset > right_threshold:
+            return "RIGHT"
+        return "STRAIGHT"
+
+    # Function that returns the filtered (direction, braking, accelerating) for a FrameAnalysis
+    def update(self, analysis):
+        now = analysis.timestamp if analysis.timestamp is not None else time.perf_counter()
+
+        # Counts the changes the frame's own decisions would have made
+        raw_decisions = (analysis.direction, analysis.braking, analysis.accelerating)
+        if self.raw_decisions is not None:
+            self.raw_transitions += sum(raw != last for raw, last in zip(raw_decisions, self.raw_decisions))
+        self.raw_decisions = raw_decisions
+
+        direction = self.direction.update(self.wanted_direction(analysis), now)
+        braking = self.braking.update(self.radius_past_threshold(analysis, BRAKE, self.braking.state), now)
+        accelerating = self.accelerating.update(self.radius_past_threshold(analysis, ACC, self.accelerating.state), now)
+
+        if self.stats is not None:
+            self.stats.suppressed_transitions = self.suppressed_transitions
+        return direction, braking, accelerating
@@ -0,0 +1,178 @@
+# Module used for contours and the preview mask
+import cv2
+# Used to time how long measuring the colours takes
+import time
+# Imports numpy for the masks
+import numpy as np
+# Library that can be used to grab contours
+import imutils
+
+# Index of each colour in the labelled image
+DIR1 = 0
+DIR2 = 1
+BRAKE = 2
+ACC = 3
+
+# Placeholder for values that have not been worked out yet (None cannot be used as it is a valid result)
+NOT_COMPUTED = object()
+
+# Function to find radius and centre of contours
+def find_radius_and_centre(contours):
+    # Finds the largest contour by area of, for example, brake_contours
+    c = max(contours, key=cv2.contourArea)
+    # Finds the minimum enclosing circle of that biggest contour and gets the centre coordinates and radius of circle
+    ((centre), radius) = cv2.minEnclosingCircle(c)
+
+    return radius, centre
+
+# Class that holds the result of processing one frame
+# Masks, contours, measurements and decisions are only worked out the first time they are needed and then remembered,
+# so nothing is computed twice and anything that is not needed (e.g. direction when only braking is checked) is never computed
+class FrameAnalysis:
+
+    __slots__ = ["image_BGR", "label_image", "timestamp", "search_window",
+                 "radius_threshold", "direction_threshold",
+                 "_masks", "_contours", "_measurements", "_direction", "_steering", "_braking", "_accelerating", "_preview_mask", "_measure_time"]
+
+    def __init__(self, image_BGR, label_image, timestamp=None, search_window=None,
+                 radius_threshold=15, direction_threshold=40):
+        # Values are set with object.__setattr__ because this class does not allow its attributes to be changed
+        set_value = object.__setattr__
+        # Full size mirrored camera frame (used for the preview)
+        set_value(self, "image_BGR", image_BGR)
+        # Image at the analysis scale where each pixel holds bit flags for which of the 4 colours it is
+        label_image.flags.writeable = False
+        set_value(self, "label_image", label_image)
+        # Time the frame was captured at
+        set_value(self, "timestamp", timestamp)
+        # Part of the frame that was searched (x0, y0, x1, y1), None if it was the whole frame
+        set_value(self, "search_window", search_window)
+        # Thresholds already scaled to the analysis scale
+        set_value(self, "radius_threshold", radius_threshold)
+        set_value(self, "direction_threshold", direction_threshold)
+
+        # Values worked out when first needed
+        set_value(self, "_masks", [NOT_COMPUTED] * 4)
+        set_value(self, "_contours", [NOT_COMPUTED] * 4)
+        set_value(self, "_measurements", [NOT_COMPUTED] * 4)
+        set_value(self, "_direction", NOT_COMPUTED)
+        set_value(self, "_steering", NOT_COMPUTED)
+        set_value(self, "_braking", NOT_COMPUTED)
+        set_value(self, "_accelerating", NOT_COMPUTED)
+        set_value(self, "_preview_mask", NOT_COMPUTED)
+        # Total time (in seconds) spent finding masks, contours and measurements of this frame
+        set_value(self, "_measure_time", 0.0)
+
+    # Stops anything outside this class from changing the result of a frame
+    def __setattr__(self, name, value):
+        raise AttributeError("FrameAnalysis cannot be changed")
+
+    # Function that returns the mask of one colour (non-zero where the colour is)
+    def mask(self, colour_index):
+        if self._masks[colour_index] is NOT_COMPUTED:
+            self._masks[colour_index] = np.bitwise_and(self.label_image, np.uint8(1 << colour_index))
+        return self._masks[colour_index]
+
+    # Function that returns the contours of one colour
+    def contours(self, colour_index):
+        if self._contours[colour_index] is NOT_COMPUTED:
+            # Contours found using OpenCV's function "findContours" then grabbed using imutils' function "grab_contours"
+            contours = cv2.findContours(self.mask(colour_index), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            self._contours[colour_index] = imutils.grab_contours(contours)
+        return self._contours[colour_index]
+
+    # Function that returns the radius and centre of the largest blob of a colour, or None if the colour is not in the frame
+    def measure(self, colour_index):
+        if self._measurements[colour_index] is NOT_COMPUTED:
+            start = time.perf_counter()
+            contours = self.contours(colour_index)
+            # Checks if the length of the contours is more than 0 suggesting the colour could be being shown by user
+            result = find_radius_and_centre(contours) if len(contours) > 0 else None
+            self._measurements[colour_index] = result
+            object.__setattr__(self, "_measure_time", self._measure_time + time.perf_counter() - start)
+        return self._measurements[colour_index]
+
+    # Function that returns True if a colour has already been measured (without measuring it)
+    def is_measured(self, colour_index):
+        return self._measurements[colour_index] is not NOT_COMPUTED
+
+    # Time (in seconds) spent so far finding the masks, contours and measurements of this frame
+    @property
+    def measure_time(self):
+        return self._measure_time
+
+    # Function that returns True if a colour is shown with a radius larger than the threshold (15 at full resolution)
+    def is_shown(self, colour_index):
+        measurement = self.measure(colour_index)
+        return measurement is not None and measurement[0] > self.radius_threshold
+
+    # True if accelerating colour is shown, otherwise False
+    @property
+    def accelerating(self):
+        if self._accelerating is NOT_COMPUTED:
+            object.__setattr__(self, "_accelerating", self.is_shown(ACC))
+        return self._accelerating
+
+    # True if braking colour is shown, otherwise False
+    @property
+    def braking(self):
+        if self._braking is NOT_COMPUTED:
+            object.__setattr__(self, "_braking", self.is_shown(BRAKE))
+        return self._braking
+
+    # String of direction to turn: "LEFT", "RIGHT", "STRAIGHT" or "Contour(s) missing"
+    @property
+    def direction(self):
+        if self._direction is NOT_COMPUTED:
+            object.__setattr__(self, "_direction", self.find_direction())
+        return self._direction
+
+    # Function which works out the direction to turn if both direction colours are in frame
+    def find_direction(self):
+        # If both direction colours have radii more than 15 then both are in frame so that a direction can be determined
+        if self.is_shown(DIR1) and self.is_shown(DIR2):
+            dir1_centre = self.measure(DIR1)[1]
+            dir2_centre = self.measure(DIR2)[1]
+            # If the x-coordinate of the top colour is less than that of the bottom colour minus 40 (threshold at full resolution)
+            if dir1_centre[0] < (dir2_centre[0] - self.direction_threshold):
+                # Suggests user wants to steer left
+                return "LEFT"
+            # Otherwise if the x-coordinate of the bottom colour is less than that of the top colour minus 40 (threshold at full resolution)
+            elif dir2_centre[0] < (dir1_centre[0] - self.direction_threshold):
+                # Suggests user wants to steer right
+                return "RIGHT"
+            # Suggests user wants to drive straight
+            return "STRAIGHT"
+
+        # Returned if at least one of the direction colours is missing from the frame
+        return "Contour(s) missing"
+
+    # How far the wheel is turned from -1 (fully left) to 1 (fully right), 0 if a direction colour is missing
+    # Used by outputs with an analog steering axis (see key_output.py)
+    @property
+    def steering(self):
+        if self._steering is NOT_COMPUTED:
+            steering = 0.0
+            if self.is_shown(DIR1) and self.is_shown(DIR2):
+                dir1_centre = self.measure(DIR1)[1]
+                dir2_centre = self.measure(DIR2)[1]
+                # Sine of the angle the line between the direction colours has turned from vertical
+                distance = np.hypot(dir1_centre[0] - dir2_centre[0], dir1_centre[1] - dir2_centre[1])
+                if distance > 0:
+                    steering = float(np.clip((dir2_centre[0] - dir1_centre[0]) / distance, -1, 1))
+                    # The top colour being left of the bottom colour means steering left
+                    steering = -steering
+            object.__setattr__(self, "_steering", steering)
+        return self._steering
+
+    # Mask the same size as the camera frame containing all 4 colours, used to show the preview (see preview.py)
+    @property
+    def preview_mask(self):
+        if self._preview_mask is NOT_COMPUTED:
+            # The labelled image is non-zero wherever any of the 4 colours are, so it is the mask that contains all 4 colours
+            resultant_mask = self.label_image
+            # Mask is scaled back up to the size of the preview (INTER_NEAREST keeps the mask values unchanged)
+            if resultant_mask.shape[:2] != self.image_BGR.shape[:2]:
+                resultant_mask = cv2.resize(resultant_mask, (self.image_BGR.shape[1], self.image_BGR.shape[0]), interpolation=cv2.INTER_NEAREST)
+            object.__setattr__(self, "_preview_mask", resultant_mask)
+        return self._preview_mask
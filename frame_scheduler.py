@@ -0,0 +1,146 @@
+# Used to time how long each frame takes and when the next one should be processed
+import time
+
+# Class that works out when the next frame should be processed
+# Frames are processed when the camera is expected to have a new one (worked out from the time between the frames it has given)
+# but never more often than the target rate, and any frame that takes longer than its budget is counted as missed
+class FramePacer:
+
+    # target_fps is the most frames a second to process (None to keep up with the camera)
+    # stats is a LatencyStats (see latency.py) that missed deadlines are counted in, or None
+    def __init__(self, target_fps=None, stats=None):
+        self.target_fps = target_fps
+        self.stats = stats
+
+        # Time the current frame started being processed
+        self.started = None
+        # Capture time of the last frame processed and the average time between the camera's frames
+        self.last_frame_timestamp = None
+        self.frame_interval = None
+        # Average time (in seconds) taken to process a frame
+        self.average_cost = None
+
+        # Number of frames processed and number that took longer than their budget
+        self.frames = 0
+        self.missed_deadlines = 0
+
+    # Time (in seconds) between frames at the target rate, None if there is no target rate
+    @property
+    def period(self):
+        if not self.target_fps:
+            return None
+        return 1 / self.target_fps
+
+    # Most time (in seconds) a frame can take before the next one is due, None if it is not known yet
+    def budget(self):
+        if self.period is not None:
+            return max(self.period, self.frame_interval or 0)
+        return self.frame_interval
+
+    # Function called just before a frame is processed
+    def begin(self):
+        self.started = time.perf_counter()
+
+    # Function called after a frame is processed, frame_timestamp is when it was captured (None if there was no new frame)
+    # Returns how long (in seconds) to wait before processing the next frame
+    def end(self, frame_timestamp):
+        now = time.perf_counter()
+        started = self.started if self.started is not None else now
+
+        # No new frame yet, so check again after a small part of the time between frames
+        if frame_timestamp is None:
+            interval = self.frame_interval or self.period or 0.01
+            return max(0.001, interval / 4)
+
+        # Average time between the camera's frames (only frames that are newer than the last one count)
+        if self.last_frame_timestamp is not None and frame_timestamp > self.last_frame_timestamp:
+            interval = frame_timestamp - self.last_frame_timestamp
+            self.frame_interval = interval if self.frame_interval is None else 0.9 * self.frame_interval + 0.1 * interval
+        self.last_frame_timestamp = frame_timestamp
+
+        cost = now - started
+        self.average_cost = cost if self.average_cost is None else 0.9 * self.average_cost + 0.1 * cost
+        self.frames += 1
+        budget = self.budget()
+        if budget is not None and cost > budget:
+            self.missed_deadlines += 1
+            if self.stats is not None:
+                self.stats.missed_deadlines += 1
+
+        # Next frame is processed when the camera should have given a new one, but not sooner than the target rate allows
+        next_time = started + (self.period or 0)
+        # Frames "captured" in the future come from a recording being replayed as fast as possible, which is not held back
+        if self.frame_interval is not None and frame_timestamp <= now:
+            next_time = max(next_time, frame_timestamp + self.frame_interval)
+        return max(0.0, next_time - now)
+
+    # Function that waits (in the current thread) until the next frame should be processed
+    def wait(self, frame_timestamp):
+        delay = self.end(frame_timestamp)
+        if delay > 0:
+            time.sleep(delay)
+
+# Class that repeatedly calls a function using tkinter's "after", paced by a FramePacer instead of a fixed delay
+# The function should return the capture time of the frame it processed, or None if there was no new frame
+class FrameScheduler:
+
+    def __init__(self, widget, callback, target_fps=None, stats=None):
+        self.widget = widget
+        self.callback = callback
+        self.pacer = FramePacer(target_fps, stats)
+        # ID of the next scheduled call, so it can be cancelled
+        self.after_id = None
+
+    def start(self):
+        self.run()
+
+    # Function that processes one frame and schedules the next one
+    def run(self):
+        self.pacer.begin()
+        frame_timestamp = self.callback()
+        delay = self.pacer.end(frame_timestamp)
+        # At least 1 ms so tkinter still has time to handle other events
+        self.after_id = self.widget.after(max(1, int(delay * 1000)), self.run)
+
+    def stop(self):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    # Number of frames that took longer than their budget
+    @property
+    def missed_deadlines(self):
+        return self.pacer.missed_deadlines
+
+# Class that repeatedly calls a function using tkinter's "after" at a fixed rate, for loops with no frames of their own to pace by
+# (e.g. showing the previews of a worker process, whose frames were captured by the worker and not by this loop)
+# Each call is scheduled from when the last one was due, not when it finished, so time spent in the function does not slow the rate down
+class FixedRateScheduler:
+
+    # fps is how many times a second to call the function (None or 0 for 10 times a second)
+    def __init__(self, widget, callback, fps=None):
+        self.widget = widget
+        self.callback = callback
+        self.period = 1 / fps if fps else 0.1
+        # Time the next call is due, and the ID of the scheduled call so it can be cancelled
+        self.next_time = None
+        self.after_id = None
+
+    def start(self):
+        self.next_time = time.perf_counter()
+        self.run()
+
+    def run(self):
+        self.callback()
+        now = time.perf_counter()
+        self.next_time += self.period
+        # Calls that were missed (e.g. while a window was being moved) are skipped instead of being made all at once
+        if self.next_time < now:
+            self.next_time = now + self.period
+        # At least 1 ms so tkinter still has time to handle other events
+        self.after_id = self.widget.after(max(1, int((self.next_time - now) * 1000)), self.run)
+
+    def stop(self):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
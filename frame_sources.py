@@ -0,0 +1,317 @@
+# Module used to capture and read frames from cameras and video files
+import cv2
+# Imports numpy for storing recorded frames and timestamps
+import numpy as np
+# Used to timestamp frames and to pace replays at their original speed
+import time
+# Used to check the file extension of recordings
+import os
+# Used to capture frames in the background without blocking the GUI
+import threading
+
+# Capture settings asked for when a camera is opened, None means the driver's default is used
+# fourcc is the pixel format (e.g. "MJPG", which lets many webcams send more frames a second than "YUYV")
+# and buffer_size is how many frames the driver keeps waiting (1 means frames are never old when they are read)
+DEFAULT_CAPTURE_SETTINGS = {
+    "width": None,
+    "height": None,
+    "fps": None,
+    "fourcc": None,
+    "buffer_size": None,
+}
+
+# Function that turns an OpenCV FOURCC number into its four letters (e.g. "MJPG")
+def fourcc_to_text(fourcc):
+    fourcc = int(fourcc)
+    return "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))
+
+# Class for reading frames from a live webcam
+class CameraSource:
+
+    # settings is a dictionary like DEFAULT_CAPTURE_SETTINGS (missing or None settings are left as the driver's default)
+    def __init__(self, index=0, settings=None):
+        # Camera index 0 is the default webcam
+        self.cap = cv2.VideoCapture(index)
+        # Time (in seconds) at which the most recent frame was read
+        self.timestamp = None
+        self.settings = dict(DEFAULT_CAPTURE_SETTINGS)
+        if settings is not None:
+            self.settings.update(settings)
+        self.apply_settings()
+
+    # Function that asks the driver for the capture settings
+    # The pixel format is set first as it can change which sizes and frame rates are available
+    def apply_settings(self):
+        settings = self.settings
+        if settings["fourcc"] is not None:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*settings["fourcc"]))
+        if settings["width"] is not None:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, settings["width"])
+        if settings["height"] is not None:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, settings["height"])
+        if settings["fps"] is not None:
+            self.cap.set(cv2.CAP_PROP_FPS, settings["fps"])
+        if settings["buffer_size"] is not None:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, settings["buffer_size"])
+
+    # Function that returns the mode the driver actually chose, which may not be what was asked for
+    def mode(self):
+        return {
+            "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": fourcc_to_text(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            # Some backends cannot report the buffer size and return 0
+            "buffer_size": int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        }
+
+    # True if the camera was opened
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    # Function that works the same way as cv2.VideoCapture's "read" function
+    def read(self):
+        ret, frame = self.cap.read()
+        # Uses perf_counter as it is the most precise clock available
+        self.timestamp = time.perf_counter()
+        return ret, frame
+
+    # Function that frees the camera so other programs can use it
+    def release(self):
+        self.cap.release()
+
+# Class for replaying a recorded session from a video file or a .npz frame dump
+class RecordingSource:
+
+    def __init__(self, path, realtime=False, loop=False):
+        self.path = path
+        # If True, frames are returned at the pace they were recorded at, otherwise as fast as possible
+        self.realtime = realtime
+        # If True, the recording starts again from the beginning once the last frame has been read
+        self.loop = loop
+        self.timestamp = None
+
+        # .npz files store every frame in memory along with the time each frame was captured
+        if os.path.splitext(path)[1].lower() == ".npz":
+            data = np.load(path)
+            self.frames = data["frames"]
+            self.timestamps = data["timestamps"]
+            self.cap = None
+        # Any other file is treated as a video file that OpenCV can open
+        else:
+            self.frames = None
+            self.cap = cv2.VideoCapture(path)
+            # Timestamps are stored next to the video by FrameRecorder if the session was recorded by this app
+            timestamps_path = path + ".timestamps.npy"
+            if os.path.exists(timestamps_path):
+                self.timestamps = np.load(timestamps_path)
+            # Otherwise timestamps are worked out from the frame rate stored in the video
+            else:
+                fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+                frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                self.timestamps = np.arange(max(frame_count, 0)) / fps
+
+        # Index of the next frame to be read
+        self.position = 0
+        # Time the replay started (set when the first frame is read)
+        self.start_time = None
+
+    # Function that returns the number of frames in the recording
+    def __len__(self):
+        if self.frames is not None:
+            return len(self.frames)
+        return len(self.timestamps)
+
+    # Function that goes back to the first frame of the recording
+    def rewind(self):
+        self.position = 0
+        self.start_time = None
+        if self.cap is not None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    # Function that works the same way as cv2.VideoCapture's "read" function
+    def read(self):
+        # Goes back to the start of the recording if the end has been reached and looping is enabled
+        if self.position >= len(self) and self.loop:
+            self.rewind()
+
+        if self.frames is not None:
+            if self.position >= len(self.frames):
+                return False, None
+            frame = self.frames[self.position]
+            ret = True
+        else:
+            ret, frame = self.cap.read()
+            if not ret:
+                return False, None
+
+        # Recorded time of this frame relative to the first frame of the recording
+        if self.position < len(self.timestamps):
+            offset = float(self.timestamps[self.position] - self.timestamps[0])
+        else:
+            offset = 0.0
+
+        if self.start_time is None:
+            self.start_time = time.perf_counter() - offset
+        # Waits until the frame would have arrived from the camera if replaying at the original pace
+        if self.realtime:
+            delay = self.start_time + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.timestamp = time.perf_counter()
+        # Otherwise the timestamp is the recorded one so results are the same on every replay
+        else:
+            self.timestamp = self.start_time + offset
+
+        self.position += 1
+        return ret, frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+# Class that records every frame read from another source so the session can be replayed later
+class FrameRecorder:
+
+    def __init__(self, source, path, fps=30.0):
+        # The source being recorded (e.g. a CameraSource)
+        self.source = source
+        # Where the recording is saved (.npz for a frame dump, anything else for a video file)
+        self.path = path
+        self.fps = fps
+        self.timestamp = None
+
+        # Frames are only kept in memory when saving a .npz file
+        self.frames = []
+        self.timestamps = []
+        # Video writer is created once the size of the first frame is known
+        self.writer = None
+        self.is_npz = os.path.splitext(path)[1].lower() == ".npz"
+
+    # Function that reads a frame from the source and records it before returning it
+    def read(self):
+        ret, frame = self.source.read()
+        self.timestamp = self.source.timestamp
+        if ret:
+            self.timestamps.append(self.timestamp)
+            if self.is_npz:
+                # Copy made in case the source reuses the same array for the next frame
+                self.frames.append(frame.copy())
+            else:
+                if self.writer is None:
+                    height, width = frame.shape[:2]
+                    fourcc = cv2.VideoWriter_fourcc(*"MJPG")
+                    self.writer = cv2.VideoWriter(self.path, fourcc, self.fps, (width, height))
+                self.writer.write(frame)
+        return ret, frame
+
+    # Function that writes the recording to disk without releasing the source
+    def save(self):
+        timestamps = np.array(self.timestamps, dtype=np.float64)
+        if self.is_npz:
+            # Frames are stored as one array of shape (number of frames, height, width, 3)
+            np.savez(self.path, frames=np.array(self.frames), timestamps=timestamps)
+        else:
+            if self.writer is not None:
+                self.writer.release()
+                self.writer = None
+            # Timestamps saved next to the video so RecordingSource can replay at the original pace
+            np.save(self.path + ".timestamps.npy", timestamps)
+
+    # Function that saves the recording and releases the source being recorded
+    def release(self):
+        self.save()
+        self.source.release()
+
+# Class that reads frames from another source on a background thread, only keeping the newest one
+class ThreadedCapture:
+
+    # timeout is how long "read" waits for a new frame by default (0 so the GUI is never blocked)
+    def __init__(self, source, timeout=0):
+        # The source frames are read from (e.g. a CameraSource)
+        self.source = source
+        self.timeout = timeout
+        # Time the frame in the slot was captured at
+        self.timestamp = None
+
+        # The "slot" holding only the newest frame and the time it was captured
+        self.frame = None
+        self.frame_timestamp = None
+        # True if the frame in the slot has not been read yet
+        self.has_new_frame = False
+        # Condition used to protect the slot and wake up readers waiting for a new frame
+        self.condition = threading.Condition()
+
+        # Number of frames read from the source and number replaced in the slot before being read
+        self.frames_captured = 0
+        self.frames_dropped = 0
+
+        # Becomes False when the thread has been told to stop or the source has run out of frames
+        self.running = True
+        # Daemon thread so it does not stop the program from closing
+        self.thread = threading.Thread(target=self.capture_loop, daemon=True)
+        self.thread.start()
+
+    # Function run on the background thread which keeps reading frames into the slot
+    def capture_loop(self):
+        while self.running:
+            ret, frame = self.source.read()
+            if not ret:
+                # Camera has failed or the recording has ended
+                break
+            with self.condition:
+                # If the previous frame was never read, it has been dropped in favour of this newer one
+                if self.has_new_frame:
+                    self.frames_dropped += 1
+                self.frame = frame
+                self.frame_timestamp = self.source.timestamp
+                self.has_new_frame = True
+                self.frames_captured += 1
+                self.condition.notify_all()
+
+        with self.condition:
+            self.running = False
+            # Wakes up any reader waiting for a frame that will never arrive
+            self.condition.notify_all()
+
+    # Function that works like cv2.VideoCapture's "read" function but returns the newest frame
+    # If there is no new frame it waits up to "timeout" seconds (0 means return straight away) before returning (False, None)
+    def read(self, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        with self.condition:
+            if not self.has_new_frame and self.running and timeout != 0:
+                self.condition.wait_for(lambda: self.has_new_frame or not self.running, timeout)
+            if not self.has_new_frame:
+                return False, None
+            self.has_new_frame = False
+            self.timestamp = self.frame_timestamp
+            return True, self.frame
+
+    # Function that stops the background thread and releases the source
+    def release(self):
+        self.running = False
+        self.thread.join(timeout=1.0)
+        self.source.release()
+
+# Function that opens a camera if given a camera index, otherwise a recording at the given path
+# capture_settings are the settings used if it is a camera (see DEFAULT_CAPTURE_SETTINGS)
+def open_source(source, realtime=False, loop=False, capture_settings=None):
+    if isinstance(source, int) or str(source).isdigit():
+        return CameraSource(int(source), capture_settings)
+    return RecordingSource(source, realtime=realtime, loop=loop)
+
+# Records a session from the webcam when this file is run, e.g. "python frame_sources.py session.npz 10"
+if __name__ == "__main__":
+    import sys
+
+    output_path = sys.argv[1] if len(sys.argv) > 1 else "session.npz"
+    # Number of seconds to record for
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+
+    recorder = FrameRecorder(CameraSource(0), output_path)
+    end_time = time.perf_counter() + duration
+    while time.perf_counter() < end_time:
+        recorder.read()
+    recorder.release()
+    print("Recorded " + str(len(recorder.timestamps)) + " frames to " + output_path)
@@ -1,13 +1,82 @@
+# Used to measure how long the main menu takes to appear, so it is imported (and the clock read) before anything else
+import time
+START_TIME = time.perf_counter()
 # Module used to create simple-looking GUI applications
 import tkinter as tk
-# Imports numpy for arrays used in CalibrationWindow
-import numpy as np
-# Imports the class that was created for image processing
-from image_processing import ImageProcessing
-# Module used for virtual keyboard presses
-from pynput.keyboard import Key, Controller
-# Module to be used to display images in the user guide
-from PIL import Image, ImageTk
+# Used to read the profile to load from the command line
+import argparse
+# Used to load OpenCV, numpy and the camera in the background once the main menu is shown
+import threading
+# Used to check whether the camera manager was ever imported before closing the camera
+import sys
+# Used to tell the user why the calibration window cannot be opened while playing
+from tkinter import messagebox
+# Used to time each stage of the image processing
+from latency import LatencyStats, format_summary, write_csv
+# Class that runs the camera loops when a new frame is expected instead of every 10 ms
+from frame_scheduler import FrameScheduler, FixedRateScheduler
+
+# The modules below need OpenCV, numpy, PIL or pynput, which take a long time to import, so they are imported by
+# import_vision (when a window first needs them, or in the background after the main menu is shown) instead of here
+# The main menu, keyboard preferences and about windows need none of them
+
+# Function that imports the image processing, camera and output modules into this module's global variables
+# Importing a module that has already been imported does nothing, so this can be called before anything that uses them
+def import_vision():
+    global np, cv2, ImageProcessing, HSVLookupTable, list_profiles, load_profile, save_profile
+    global create_prefilter, PreviewRenderer, ColourSampler, OutputDispatcher, create_backend, VisionWorker, default_manager, DecisionFilter
+    # Imports numpy for arrays used in CalibrationWindow
+    import numpy as np
+    # Used to draw the area being sampled in CalibrationWindow
+    import cv2
+    # Imports the class that was created for image processing
+    from image_processing import ImageProcessing
+    # Lookup table compiled from the calibrated colours
+    from segmentation import HSVLookupTable
+    # Functions used to save and load the calibrated colours and keys
+    from profiles import list_profiles, load_profile, save_profile
+    # Function used to create the filter that removes noise from the camera footage
+    from prefilters import create_prefilter
+    # Class used to show the camera footage in a label
+    from preview import PreviewRenderer
+    # Class used to work out a colour's HSV range from the pixels the user clicks on
+    from colour_sampling import ColourSampler
+    # Classes that press the keys (or move a virtual gamepad) for the steering wheel gestures
+    from key_output import OutputDispatcher, create_backend
+    # Class used to run the image processing in a separate process
+    from vision_worker import VisionWorker
+    # Camera manager that shares the webcam between the calibration and play windows
+    from camera_manager import default_manager
+    # Class that stops the keys being pressed and released over and over when a marker is near a threshold
+    from decision_filter import DecisionFilter
+
+# Function that loads an image for the user guide windows (PIL is imported here so the main menu does not have to wait for it)
+def load_image(path):
+    from PIL import Image, ImageTk
+    return ImageTk.PhotoImage(Image.open(path))
+
+# Function run in a background thread after the main menu is shown, so the calibration and play windows open straight away
+# Pays for importing the modules, OpenCV's first call of each function and (if open_camera is True) opening the camera,
+# which is then kept warm for the calibration window
+def warm_up(open_camera):
+    start = time.perf_counter()
+    import_vision()
+    # Imported here to be ready for the play window's key presses
+    import pynput.keyboard
+    import PIL.ImageTk
+    # The first call of each OpenCV function is much slower than the rest (e.g. loading optimised code and starting threads)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    image_HSV = cv2.cvtColor(cv2.medianBlur(frame, 15), cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(image_HSV, np.array([0, 0, 0]), np.array([10, 255, 255]))
+    cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if open_camera:
+        # Opened with the same settings the windows use, then kept open for a while by the camera manager (see camera_manager.py)
+        try:
+            default_manager.acquire(0, settings=capture_settings).release()
+        except Exception as error:
+            # The windows will show the problem if they cannot open the camera either
+            print("Could not warm up the camera:", error)
+    print("Warm-up finished after %.0f ms" % ((time.perf_counter() - start) * 1000))
 
 # Global variable used by CalibrationWindow class and PlayWindow class
 global calibrated
@@ -15,7 +84,86 @@ calibrated = False # Set to false because when the program is run, calibration w
 
 #  Global variable to be used by PlayWindow class and KeyboardPref
 global keys_to_use
-keys_to_use = [Key.up, Key.left, Key.down, Key.right] # Default set to arrow keys
+# Keys are stored as text (see key_to_text in key_output.py) so pynput does not have to be imported to start the program
+keys_to_use = ["Key.up", "Key.left", "Key.down", "Key.right"] # Default set to arrow keys
+
+# Global variable for the fraction of the camera resolution the play window finds colours at (e.g. 0.5 or 0.25 for slower computers)
+global analysis_scale
+analysis_scale = 1.0
+
+# Global variable that makes the play window only search around where the wheel was last seen
+global roi_tracking
+roi_tracking = True
+
+# Global variables for the filter used to remove noise ("median", "box", "gaussian", "downscaled", "open", "close" or "none") and its size
+global blur_type
+blur_type = "median"
+global blur_size
+blur_size = 15
+
+# Global variables for how many times a second the play window's preview is updated and whether it is shown at all
+global preview_fps
+preview_fps = 15
+global show_preview
+show_preview = True
+
+# Global variable for what the steering wheel controls: "keyboard" (keys_to_use), "gamepad" (Linux virtual gamepad) or "loopback" (testing)
+global output_backend
+output_backend = "keyboard"
+
+# Global variable for the most frames a second the calibration and play windows process (None to keep up with the camera)
+global target_fps
+target_fps = None
+
+# Global variable for the hysteresis bands and minimum hold times (in seconds) of each control (see decision_filter.py)
+# None makes every frame's decisions be used as they are
+global decision_filter
+decision_filter = {} # Empty uses DEFAULT_FILTER_SETTINGS in decision_filter.py
+
+# Global variable for the webcam's width, height, fps, fourcc (pixel format, e.g. "MJPG") and buffer_size
+# None leaves a setting as the driver's default, run "python camera_probe.py" to find the fastest mode for a webcam
+global capture_settings
+capture_settings = {} # Empty uses DEFAULT_CAPTURE_SETTINGS in frame_sources.py
+
+# Global variable that makes the play window run the image processing and key presses in a separate process,
+# so moving windows or other work in the GUI does not slow down steering
+global vision_process
+vision_process = True
+
+# Global variable for whether the play window shows how long each stage of the image processing takes
+global show_timings
+show_timings = False
+
+# Global variable that makes the camera be opened in the background once the main menu is shown,
+# so the calibration window does not have to wait for it (it is closed again if not used, see camera_manager.py)
+# Only used when vision_process is off, as a worker process cannot use a camera opened by this process
+global warm_up_camera
+warm_up_camera = True
+
+# Global variable for the lookup table compiled from the 4 calibrated colours (used by PlayWindow class)
+global hsv_table
+hsv_table = None
+
+# Function that loads a saved profile into the global variables, so the play window can be opened without calibrating
+# Returns a message saying why if the profile could not be loaded (e.g. there is no profile with that name), otherwise None
+def apply_profile(name):
+    import_vision()
+    try:
+        profile = load_profile(name)
+    except FileNotFoundError:
+        return "There is no saved profile called '" + name + "'"
+    # The file is not valid JSON or is missing some of the profile
+    except (ValueError, KeyError, TypeError) as error:
+        return "Profile '" + name + "' could not be read (" + str(error) + ")"
+    global dir1_HSV, dir2_HSV, brake_HSV, acc_HSV
+    dir1_HSV, dir2_HSV, brake_HSV, acc_HSV = profile["colour_ranges"]
+    global keys_to_use
+    keys_to_use = profile["keys"]
+    global hsv_table
+    hsv_table = profile["lookup_table"]
+    global calibrated
+    calibrated = True
+    return None
 
 # Class for the main menu window
 class MainMenuWindow:
@@ -39,16 +187,29 @@ class MainMenuWindow:
         self.btn_start_playing = tk.Button(self.master, text="Start Playing", background="orange", font=("Helvetica", 15), width=20, height=2, command=self.open_play_win)
         self.btn_start_playing.grid(row=2, column=0, pady=10)
 
+        # "Load Profile" button is linked to the "open_profiles_win" function
+        self.btn_load_profile = tk.Button(self.master, text="Load Profile", background="orange", font=("Helvetica", 15), width=20, height=2, command=self.open_profiles_win)
+        self.btn_load_profile.grid(row=3, column=0, pady=10)
+
         # "Keyboard Preferences" button is linked to the "open_key_prefs_win" function
         self.btn_key_prefs = tk.Button(self.master, text="Keyboard Preferences", background="orange", font=("Helvetica", 15), width=20, height=2, command=self.open_key_prefs_win)
-        self.btn_key_prefs.grid(row=3, column=0, pady=10)
+        self.btn_key_prefs.grid(row=4, column=0, pady=10)
 
         # "About" button is linked to the "open_about_win" function
         self.btn_about = tk.Button(self.master, text="About", background="orange", font=("Helvetica", 15), width=20, height=2, command=self.open_about_win)
-        self.btn_about.grid(row=4, column=0, pady=(10, 20)) # Needs to have different padding on the top and bottom
+        self.btn_about.grid(row=5, column=0, pady=(10, 20)) # Needs to have different padding on the top and bottom
     
     # Function called to open the calibration window when the "Begin Calibration" button is pressed
     def open_cal_win(self):
+        # Only one calibration window can be open at a time, so the existing one is brought to the front instead
+        if CalibrationWindow.open_window is not None:
+            CalibrationWindow.open_window.master.lift()
+            return
+        # The play window's worker process has the camera open, and a camera cannot be shared between processes
+        if PlayWindow.open_window is not None and PlayWindow.open_window.worker is not None:
+            PlayWindow.open_window.master.lift()
+            messagebox.showinfo("Camera in use", "Close the play window before calibrating, the camera can only be used by one of them at a time", parent=self.master)
+            return
         # Creates new window with the top level being the master (i.e. the root)
         self.newWindow = tk.Toplevel(self.master)
         # Calibration window has the self.newWindow as the master
@@ -56,11 +217,22 @@ class MainMenuWindow:
 
     # Function called to open the play window when the "Start Playing" button is pressed
     def open_play_win(self):
+        # Only one play window can be open at a time (two would press the keys twice), so the existing one is brought to the front instead
+        if PlayWindow.open_window is not None:
+            PlayWindow.open_window.master.lift()
+            return
         # Creates new window with the top level being the master (i.e. the root)
         self.newWindow = tk.Toplevel(self.master)        
         # Play window has the self.newWindow as the master
         self.app = PlayWindow(self.newWindow)
 
+    # Function called to open the profiles window when the "Load Profile" button is pressed
+    def open_profiles_win(self):
+        # Creates new window with the top level being the master (i.e. the root)
+        self.newWindow = tk.Toplevel(self.master)
+        # Profiles window has the self.newWindow as the master, and can open the play window once a profile is loaded
+        self.app = ProfilesWindow(self.newWindow, self.open_play_win)
+
     # Function called to open the keyboard preferences window when the "Keyboard Preferences" button is pressed
     def open_key_prefs_win(self):
         # Creates new window with the top level being the master (i.e. the root)
@@ -77,10 +249,17 @@ class MainMenuWindow:
 
 # Class that contains the contents of the calibration window
 class CalibrationWindow:
+
+    # The calibration window that is currently open, None if there is not one
+    open_window = None
     
     def __init__(self, master):
+        CalibrationWindow.open_window = self
+        import_vision()
         # Instance of "ImageProcessing" class which can be accessed by all functions in CalibrationWindow class
-        self.image_processor = ImageProcessing()
+        # The camera is shared, so it does not have to be opened again if the play window does its image processing in this process
+        # (a play window using a worker process closes it, as the worker opens the camera itself)
+        self.image_processor = ImageProcessing(prefilter=create_prefilter(blur_type, blur_size), capture_settings=capture_settings)
 
         # Global variables to store lists of numpy arrays for the lower bound and upper bound of the colours
         global dir1_HSV
@@ -98,10 +277,26 @@ class CalibrationWindow:
         self.master = master
         self.master.title("Calibration")
         self.master.resizable(0, 0)
+        # Stops showing the camera when the window is closed
+        self.master.protocol("WM_DELETE_WINDOW", self.close)
 
         # Label to display the camera footage
         self.lbl_cam = tk.Label(self.master)
         self.lbl_cam.grid(row=0, column=0, rowspan=7) # Positioned to the right of window taking up 7 rows
+        # Shows every frame in lbl_cam, reusing the same image each time
+        self.preview = PreviewRenderer(self.lbl_cam)
+
+        # Clicking or dragging over a marker in lbl_cam samples its pixels over the next few frames and sets the trackbars to match
+        self.lbl_cam.bind("<ButtonPress-1>", self.start_selection)
+        self.lbl_cam.bind("<B1-Motion>", self.move_selection)
+        self.lbl_cam.bind("<ButtonRelease-1>", self.end_selection)
+        # Corner where the drag started and the area (x0, y0, x1, y1) selected, in frame pixels
+        self.drag_start = None
+        self.selection = None
+        # ColourSampler collecting the selected pixels, None when nothing is being sampled
+        self.sampler = None
+        self.lbl_sample_hint = tk.Label(self.master, text="Click or drag over the marker to set the trackbars automatically", font=("Helvetica", 12))
+        self.lbl_sample_hint.grid(row=7, column=0, pady=(0, 10))
 
         # Lower hue trackbar initially set to 0 and has a range from 0 to 179
         self.l_h = tk.Scale(self.master, label="L - H", from_=0, to=179, orient="horizontal", length=300, font=("Helvetica", 12))
@@ -129,27 +324,135 @@ class CalibrationWindow:
 
         # All 6 trackbars stored in list for convenience
         self.trackbars = [self.l_h, self.l_s, self.l_v, self.u_h, self.u_s, self.u_v]
+        # Tick box that freezes the camera on the current frame so the trackbars can be adjusted without the frame changing
+        self.frozen = tk.IntVar(value=0)
+        # Trackbar values and selection the frozen frame was last drawn with
+        self.last_drawn = None
+        # Moving a trackbar redraws the mask straight away while the frame is frozen
+        for trackbar in self.trackbars:
+            trackbar.configure(command=self.redraw_frozen)
+        self.chk_freeze = tk.Checkbutton(self.master, text="Freeze frame", variable=self.frozen, font=("Helvetica", 12), command=self.toggle_freeze)
+        self.chk_freeze.grid(row=8, column=0, pady=(0, 10))
 
         # Will be programmed to ensure lbl_cam shows camera footage according to trackbar positions
-        self.show_frame()
+        # Each frame is shown as soon as the camera should have given it (or at target_fps)
+        self.scheduler = FrameScheduler(self.lbl_cam, self.show_frame, target_fps)
+        self.scheduler.start()
         # Shows the trackbars (convenience function called)
         self.show_trackbars()
 
         # Begin stage 1 of calibration
         self.stage_1()
 
+    # Returns the time the frame was captured, or None if there was no new frame (used by the scheduler)
     def show_frame(self):
         # All elements dependent on lower HSV trackbars
         lower_bound = np.array([self.l_h.get(), self.l_s.get(), self.l_v.get()])
         # All elements dependent on upper HSV trackbars
         upper_bound = np.array([self.u_h.get(), self.u_s.get(), self.u_v.get()])
         # "ImageProcessing" class' "calibration_frame" function called with above upper and lower bounds as parameters
-        imgtk = self.image_processor.calibration_frame(lower_bound, upper_bound)
-        # Sets lbl_cam's imgtk to the return of the function called in previous line
-        self.lbl_cam.imgtk = imgtk
-        self.lbl_cam.configure(image=imgtk)
-        # Makes sure to repeat this function every 10 ms to give effect of video playing (just a series of images shown at rapid speed)
-        self.lbl_cam.after(10, self.show_frame)
+        result = self.image_processor.calibration_frame(lower_bound, upper_bound)
+        # Only updates the label if a frame was read (None is returned if the camera gave no frame)
+        if result is None:
+            return None
+        self.draw_frame(*result)
+        return self.image_processor.cap.timestamp
+
+    # Function used instead of show_frame while the frame is frozen, which only redoes the mask when a trackbar or the selection changes
+    def redraw_frozen(self, *args):
+        if not self.frozen.get():
+            return
+        lower_bound = np.array([self.l_h.get(), self.l_s.get(), self.l_v.get()])
+        upper_bound = np.array([self.u_h.get(), self.u_s.get(), self.u_v.get()])
+        # Nothing to do if nothing has changed since the frame was last drawn
+        drawn = (tuple(lower_bound), tuple(upper_bound), self.selection, self.sampler is not None)
+        if drawn == self.last_drawn:
+            return
+        result = self.image_processor.calibration_frame(lower_bound, upper_bound, frozen=True)
+        if result is None:
+            return
+        self.last_drawn = drawn
+        self.draw_frame(*result)
+
+    # Function that shows a frame in lbl_cam with its mask overlaid, and the selected area if there is one
+    def draw_frame(self, image_BGR, mask):
+        # Samples the selected pixels of this frame, and sets the trackbars once enough frames have been sampled
+        if self.sampler is not None:
+            self.sampler.add(self.image_processor.calibration_HSV)
+            if self.sampler.done:
+                self.apply_sample()
+
+        if self.selection is not None:
+            # Mask overlaid here so the selected area can be drawn on top of it
+            image_BGR = cv2.bitwise_and(image_BGR, image_BGR, mask=mask)
+            cv2.rectangle(image_BGR, self.selection[:2], self.selection[2:], (0, 255, 255), 2)
+            self.preview.render(image_BGR)
+        else:
+            # Shows the frame in lbl_cam with the mask overlaid
+            self.preview.render(image_BGR, mask)
+
+    # Function called when the "Freeze frame" tick box is pressed
+    # While frozen the camera is not processed at all, and the mask of the last frame is only redone when a trackbar moves
+    def toggle_freeze(self):
+        if self.frozen.get():
+            self.scheduler.stop()
+            self.last_drawn = None
+            self.redraw_frozen()
+        else:
+            self.scheduler.start()
+
+    # Function that turns the position of a mouse event on lbl_cam into a position in the frame
+    def frame_position(self, event):
+        if self.preview.photo is None:
+            return None
+        width, height = self.preview.photo.width(), self.preview.photo.height()
+        # The image is centred in the label, which can be slightly bigger than it
+        x = event.x - (self.lbl_cam.winfo_width() - width) // 2
+        y = event.y - (self.lbl_cam.winfo_height() - height) // 2
+        return min(max(x, 0), width - 1), min(max(y, 0), height - 1)
+
+    # Functions called when the mouse is pressed, dragged and released over lbl_cam
+    def start_selection(self, event):
+        self.drag_start = self.frame_position(event)
+        self.sampler = None
+        if self.drag_start is not None:
+            self.selection = self.drag_start + self.drag_start
+        self.redraw_frozen()
+
+    def move_selection(self, event):
+        position = self.frame_position(event)
+        if self.drag_start is None or position is None:
+            return
+        x0, y0 = self.drag_start
+        x1, y1 = position
+        self.selection = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        self.redraw_frozen()
+
+    def end_selection(self, event):
+        self.move_selection(event)
+        if self.drag_start is None:
+            return
+        x0, y0, x1, y1 = self.selection
+        # A click (or a very small drag) samples a small square around where was clicked
+        if x1 - x0 < 5 or y1 - y0 < 5:
+            x, y = self.drag_start
+            x0, y0, x1, y1 = max(x - 5, 0), max(y - 5, 0), x + 6, y + 6
+            self.selection = (x0, y0, x1, y1)
+        self.drag_start = None
+        # Pixels are collected over the next 10 frames (or just the frozen frame)
+        self.sampler = ColourSampler(self.selection, frame_count=1 if self.frozen.get() else 10)
+        self.redraw_frozen()
+
+    # Function that sets the trackbars to the range of the sampled pixels
+    def apply_sample(self):
+        bounds = self.sampler.bounds()
+        self.sampler = None
+        self.selection = None
+        if bounds is None:
+            return
+        lower_HSV, upper_HSV = bounds
+        for trackbar, value in zip(self.trackbars, list(lower_HSV) + list(upper_HSV)):
+            trackbar.set(int(value))
 
     # Convenience function to show all the trackbars without having to write it out one by one
     def show_trackbars(self):
@@ -255,12 +558,27 @@ class CalibrationWindow:
         # Button positioned at the bottom right of screen
         self.btn_acc.grid(row=6, column=1, pady=10)
     
+    # True until the calibration window releases the camera (when calibration is finished or the window is closed)
+    def using_camera(self):
+        return not self.image_processor.cap.released
+
+    # Function called when the calibration window is closed
+    def close(self):
+        self.scheduler.stop()
+        # Lets the camera manager close the camera once nothing else is using it
+        self.image_processor.cap.release()
+        CalibrationWindow.open_window = None
+        self.master.destroy()
+
     # Function called when "Finish Calibration" button pressed
     def finish_calibration(self):
         # User's camera is no longer needed (until they need to play)
         self.image_processor.cap.release()
         # Destroy everything on screen to replace with prompt message
+        self.scheduler.stop()
         self.lbl_cam.destroy()
+        self.lbl_sample_hint.destroy()
+        self.chk_freeze.destroy()
         self.btn_finish.destroy()
         # Demonstrates convenience of storing all trackbars in a list
         for trackbar in self.trackbars:
@@ -273,28 +591,56 @@ class CalibrationWindow:
         self.lbl_prompt = tk.Label(self.master, text="You can now close this window and press the 'Start Playing' button on the main menu window.", font=("Helvetica", 15))
         self.lbl_prompt.grid(row=1, column=0, padx=40, pady=50) # Will be placed underneath lbl_finish's text
 
+        # Box to type a profile name in and a button to save the calibration, so it can be loaded next time instead of calibrating again
+        self.ent_profile = tk.Entry(self.master, font=("Helvetica", 15), width=25)
+        self.ent_profile.insert(0, "default")
+        self.ent_profile.grid(row=2, column=0, pady=(0, 10))
+        self.btn_save_profile = tk.Button(self.master, text="Save Profile", background="orange", font=("Helvetica", 13), width=25, height=2, command=self.save_profile)
+        self.btn_save_profile.grid(row=3, column=0, pady=(0, 20))
+
+        # Compiles the 4 stored colour ranges into one lookup table so the play window does not have to
+        global hsv_table
+        hsv_table = HSVLookupTable([dir1_HSV, dir2_HSV, brake_HSV, acc_HSV])
+
         # Since the user has pressed the "Finish Calibration" button the variable "calibrated" can be set to true
         global calibrated
         calibrated = True
 
+    # Function called when the "Save Profile" button is pressed
+    def save_profile(self):
+        name = self.ent_profile.get().strip()
+        # Only letters, numbers, spaces, dashes and underscores are allowed as the name is used for the file names
+        if not name or not all(character.isalnum() or character in " -_" for character in name):
+            self.lbl_prompt.configure(text="Please enter a profile name using only letters, numbers, spaces, - and _")
+            return
+        save_profile(name, [dir1_HSV, dir2_HSV, brake_HSV, acc_HSV], keys_to_use)
+        self.lbl_prompt.configure(text="Saved as profile '" + name + "'. You can load it from the main menu next time, or start playing now.")
+
 # Class that contains the contents of the play window
 class PlayWindow:
+
+    # The play window that is currently open, None if there is not one
+    open_window = None
     
     # __init__ function to store the master and set the title of the window
     def __init__(self, master):
-        # Instance of "ImageProcessing" class which can be accessed by all functions in PlayWindow class
-        self.image_processor = ImageProcessing()
-
+        PlayWindow.open_window = self
+        import_vision()
         self.master = master
         self.master.resizable(0, 0) # Cannot be resized in any direction
         self.master.title("Play")
-
-        # Set up the keyboard controller for keyboard presses
-        self.keyboard = Controller()
-        # Global variable is set to the keys variable of this class that the program will "press"
-        self.keys = keys_to_use
-        # Stores the keys that are being pressed
-        self.keys_pressed = []
+        # Stops the image processing when the window is closed
+        self.master.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Only one of these is used, depending on the global variable vision_process
+        self.image_processor = None
+        self.worker = None
+        # Runs the loop of this window, so it can be stopped when the window closes
+        self.scheduler = None
+        # ID of the next scheduled update of the timings, so it can be cancelled when the window closes
+        self.timings_after_id = None
+        # Timings of each stage when the image processing is done in this process (the worker keeps its own)
+        self.stats = None
 
         # If the user has not yet finished calibrating the software
         if not calibrated:
@@ -306,98 +652,224 @@ class PlayWindow:
 
             self.lbl_prompt = tk.Label(self.master, text="Close this window to return to the main menu window and press the 'Begin Calibration' button to calibrate this software", font=("Helvetica", 15))
             self.lbl_prompt.grid(row=1, column=0, padx=40, pady=50) # Will be placed underneath lbl_warning's text
+        # The worker process could not open the camera while the calibration window is using it
+        # (a finished calibration window has already released it, so it can stay open)
+        elif vision_process and CalibrationWindow.open_window is not None and CalibrationWindow.open_window.using_camera():
+            self.lbl_warning = tk.Label(self.master, text="Camera in use!", font=("Helvetica", 20, "bold"))
+            self.lbl_warning.grid(row=0, column=0, pady=10)
+
+            self.lbl_prompt = tk.Label(self.master, text="Close this window and the calibration window, then press the 'Start Playing' button again", font=("Helvetica", 15))
+            self.lbl_prompt.grid(row=1, column=0, padx=40, pady=50)
         # Otherwise they have
         else:
             # Label to display the camera footage with mask applied
             self.lbl_cam = tk.Label(self.master)
-            self.lbl_cam.pack() # Only widget needed on this screen
+            self.lbl_cam.pack()
+            # Updates lbl_cam at most preview_fps times a second so more time is spent on detection
+            self.preview = PreviewRenderer(self.lbl_cam, max_fps=preview_fps, enabled=show_preview)
+
+            # Tick box to turn the preview on and off while playing
+            self.show_preview = tk.IntVar(value=int(show_preview))
+            self.chk_preview = tk.Checkbutton(self.master, text="Show preview", variable=self.show_preview, font=("Helvetica", 12), command=self.toggle_preview)
+            self.chk_preview.pack()
+
+            # Tick box and text showing the p50, p95 and p99 time of each stage, and a button to save them to a CSV file
+            self.show_timings = tk.IntVar(value=int(show_timings))
+            self.chk_timings = tk.Checkbutton(self.master, text="Show timings", variable=self.show_timings, font=("Helvetica", 12), command=self.toggle_timings)
+            self.chk_timings.pack()
+            self.lbl_timings = tk.Label(self.master, font=("Courier", 10), justify="left")
+            self.btn_save_timings = tk.Button(self.master, text="Save timings", background="orange", font=("Helvetica", 12), command=self.save_timings)
+            self.btn_save_timings.pack(pady=(0, 10))
             print("Calibration has been completed")
-            # Will be programmed to show camera footage with mask applied and produce the correct virtual keyboard presses
-            self.main_loop()
+
+            if vision_process:
+                # The worker process opens the camera, finds the gestures and presses the keys
+                self.worker = VisionWorker(self.settings(), [dir1_HSV, dir2_HSV, brake_HSV, acc_HSV], keys_to_use)
+                # A camera kept warm by the calibration window is closed so the worker process can open it
+                default_manager.close_idle()
+                self.worker.start()
+                # Only shows the worker's preview frames in this window, checking for them preview_fps times a second
+                # (a fixed rate, as this loop has no capture times of its own for a FrameScheduler to pace by)
+                self.scheduler = FixedRateScheduler(self.lbl_cam, self.poll_worker, preview_fps)
+                self.scheduler.start()
+            else:
+                # Instance of "ImageProcessing" class which can be accessed by all functions in PlayWindow class
+                self.stats = LatencyStats()
+                self.image_processor = ImageProcessing(analysis_scale=analysis_scale, roi_tracking=roi_tracking, prefilter=create_prefilter(blur_type, blur_size), stats=self.stats, capture_settings=capture_settings)
+                # The driver may not have used the settings asked for, so the mode it chose is shown for debugging
+                print("Camera mode:", self.image_processor.cap.mode())
+                # Uses the lookup table compiled at the end of calibration
+                self.image_processor.lookup_table = hsv_table
+                # Set up the output dispatcher which presses the keys in the global variable keys_to_use (or moves the gamepad)
+                self.output_dispatcher = OutputDispatcher(create_backend(output_backend, keys_to_use), stats=self.stats)
+                # Smooths the decisions before they are sent (None to send each frame's decisions as they are)
+                self.decision_filter = DecisionFilter(decision_filter, self.stats) if decision_filter is not None else None
+                # Will be programmed to show camera footage with mask applied and produce the correct virtual keyboard presses
+                # Each frame is processed as soon as the camera should have given it (or at target_fps), and frames that take too long are counted
+                self.scheduler = FrameScheduler(self.lbl_cam, self.main_loop, target_fps, self.stats)
+                self.scheduler.start()
+            self.toggle_timings()
+
+    # Function that returns the global settings as a dictionary to give to the worker process
+    def settings(self):
+        return {
+            "analysis_scale": analysis_scale,
+            "roi_tracking": roi_tracking,
+            "blur_type": blur_type,
+            "blur_size": blur_size,
+            "preview_fps": preview_fps,
+            "show_preview": show_preview,
+            "output": output_backend,
+            "target_fps": target_fps,
+            "capture": capture_settings,
+            "decision_filter": decision_filter,
+        }
+
+    # Loop used when the worker process is doing the image processing, which only has to update the preview
+    def poll_worker(self):
+        if self.preview.enabled:
+            image_BGR = self.worker.latest_preview()
+            # Worker has already overlaid the mask on the frame
+            if image_BGR is not None:
+                self.preview.render(image_BGR)
     
     # The main loop for the image processing and gameplay
+    # Returns the time the frame was captured, or None if there was no new frame (used by the scheduler)
     def main_loop(self):
         # "ImageProcessing" class' "play_frame" function called with the global variables for the HSV upper and lower bounds passed as parameters
-        imgtk = self.image_processor.play_frame(dir1_HSV, dir2_HSV, brake_HSV, acc_HSV)
-        # Sets the attributes for the contours of each of the contour by calling this function
-        self.image_processor.find_contours()
-
-        # Now contours are found we can check the steering wheel gestures
-        
-        # Direction checking 
-        direction = self.image_processor.check_direction()
-        if direction == "LEFT":
-            # Keyboard controller presses the left key (index 1 in arrow keys list)
-            self.keyboard.press(self.keys[1])
-            # If the left key is not in the keys that are being pressed...
-            if self.keys[1] not in self.keys_pressed:
-                # ... add it to the list of keys being pressed
-                self.keys_pressed.append(self.keys[1])
-        elif direction == "RIGHT":
-            # Keyboard controller presses the right key (index 3 in arrow keys list)
-            self.keyboard.press(self.keys[3])
-            # If the right key is not in the keys that are being pressed...
-            if self.keys[3] not in self.keys_pressed:
-                # ... add it to the list of keys being pressed
-                self.keys_pressed.append(self.keys[3])
-        # Either direction contour(s) missing or steering straight
+        # It returns a FrameAnalysis which works out the contours and gestures the first time they are asked for
+        analysis = self.image_processor.play_frame(dir1_HSV, dir2_HSV, brake_HSV, acc_HSV)
+        # If no frame could be read, try again later without changing which keys are pressed
+        if analysis is None:
+            return None
+
+        # Presses or releases keys for the steering wheel gestures in this frame (only keys that change are sent)
+        decision_start = time.perf_counter()
+        if self.decision_filter is not None:
+            direction, braking, accelerating = self.decision_filter.update(analysis)
         else:
-            # If the left key is in the list of keys that are being pressed...
-            if self.keys[1] in self.keys_pressed:
-                # ... remove it from the list
-                self.keys_pressed.remove(self.keys[1])
-                # and release that key (i.e. stop pressing it)
-                self.keyboard.release(self.keys[1])
-
-            # If the right key is in the list of keys that are being pressed...
-            if self.keys[3] in self.keys_pressed:
-                # ... remove it from the list
-                self.keys_pressed.remove(self.keys[3])
-                # and release that key
-                self.keyboard.release(self.keys[3])
-
-        # Brake checking
-        is_braking = self.image_processor.check_braking() # Returns true or false
-        if is_braking: 
-            # Keyboard controller presses the brake key (index 2 in arrow keys list)
-            self.keyboard.press(self.keys[2])
-            # If the brake key is not in the keys that are being pressed...
-            if self.keys[2] not in self.keys_pressed:
-                # ... add it to the list of keys being pressed
-                self.keys_pressed.append(self.keys[2])
+            direction, braking, accelerating = analysis.direction, analysis.braking, analysis.accelerating
+        # Steering is only measured for outputs with a steering axis (e.g. not for the keyboard)
+        steering = analysis.steering if self.output_dispatcher.wants_steering else 0.0
+        self.output_dispatcher.update(direction, braking, accelerating, analysis.timestamp, steering)
+        # Measuring the colours happens while the decision is made, so it is recorded separately
+        decision_time = time.perf_counter() - decision_start
+        self.stats.record("contours", analysis.measure_time * 1000)
+        self.stats.record("decision", (decision_time - analysis.measure_time) * 1000)
+
+        # Updates lbl_cam with this frame if the preview is on and it is time for it to be updated
+        # (checked first so no work is done on the preview for frames that are not shown)
+        if self.preview.due():
+            preview_start = time.perf_counter()
+            self.preview.render(analysis.image_BGR, analysis.preview_mask)
+            self.stats.record("preview", (time.perf_counter() - preview_start) * 1000)
+        return analysis.timestamp
+
+    # Function called when the "Show preview" tick box is pressed
+    def toggle_preview(self):
+        self.preview.enabled = bool(self.show_preview.get())
+        # Worker stops writing preview frames when they are not being shown
+        if self.worker is not None:
+            self.worker.set_preview_enabled(self.preview.enabled)
+
+    # Function that returns the latest summary of the timings, or None if there are none yet
+    def timings(self):
+        if self.worker is not None:
+            return self.worker.latest_stats()
+        return self.stats.summary()
+
+    # Function called when the "Show timings" tick box is pressed
+    def toggle_timings(self):
+        if self.show_timings.get():
+            self.lbl_timings.pack(before=self.btn_save_timings)
+            self.update_timings()
         else:
-            # If the brake key is in the list of keys that are being pressed...
-            if self.keys[2] in self.keys_pressed:
-                # ... remove it from the list
-                self.keys_pressed.remove(self.keys[2])
-                # and release that key
-                self.keyboard.release(self.keys[2])
-
-        # Acceleration checking
-        is_accelerating = self.image_processor.check_acceleration() # Returns true or false
-        if is_accelerating:
-            # Keyboard controller presses the acceleration key (index 0 in arrow keys list)
-            self.keyboard.press(self.keys[0])
-            # If the acceleration key is not in the keys that are being pressed...
-            if self.keys[0] not in self.keys_pressed:
-                # ... add it to the list of keys being pressed
-                self.keys_pressed.append(self.keys[0])
-        else:
-            # If the acceleration key is in the list of keys that are being pressed...
-            if self.keys[0] in self.keys_pressed:
-                # ... remove it from the list
-                self.keys_pressed.remove(self.keys[0])
-                # and release that key
-                self.keyboard.release(self.keys[0])
-        
-        # Prints list of keys being pressed for debugging purposes
-        print(self.keys_pressed)
+            self.lbl_timings.pack_forget()
+            if self.timings_after_id is not None:
+                self.master.after_cancel(self.timings_after_id)
+                self.timings_after_id = None
+
+    # Function that refreshes the timings once a second while they are shown
+    def update_timings(self):
+        summary = self.timings()
+        if summary is not None:
+            self.lbl_timings.configure(text=format_summary(summary))
+        self.timings_after_id = self.master.after(1000, self.update_timings)
+
+    # Function called when the "Save timings" button is pressed, saves the timings to a CSV file in the current folder
+    def save_timings(self):
+        summary = self.timings()
+        if summary is None:
+            print("No timings to save yet")
+            return
+        path = "timings_" + time.strftime("%Y%m%d_%H%M%S") + ".csv"
+        write_csv(path, summary)
+        print("Timings saved to " + path)
+
+    # Function called when the play window is closed
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        if self.timings_after_id is not None:
+            self.master.after_cancel(self.timings_after_id)
+        if self.worker is not None:
+            self.worker.stop()
+        if self.image_processor is not None:
+            self.image_processor.cap.release()
+            # Releases every key that is still being held
+            self.output_dispatcher.close()
+        PlayWindow.open_window = None
+        self.master.destroy()
+
+# Class that contains the contents of the profiles window, which lists the saved profiles so one can be loaded
+class ProfilesWindow:
+
+    # open_play_win is called to open the play window after a profile is loaded with the "Load and Play" button
+    def __init__(self, master, open_play_win):
+        self.master = master
+        self.master.resizable(0, 0) # For better aesthetics
+        self.master.title("Profiles")
+        self.open_play_win = open_play_win
+        # Profiles are read with numpy
+        import_vision()
 
-        # Sets lbl_cam's imgtk to the return of the function called in previous line
-        self.lbl_cam.imgtk = imgtk
-        self.lbl_cam.configure(image=imgtk)
-        # Makes sure to repeat this function every 10 ms to give effect of video playing (just a series of images shown at rapid speed)
-        self.lbl_cam.after(10, self.main_loop)
+        # Title label at the top of the window
+        self.lbl_title = tk.Label(self.master, text="PROFILES", font=("Helvetica", 20, "bold"))
+        self.lbl_title.grid(row=0, column=0, columnspan=2, padx=40, pady=20)
+
+        # List of saved profiles
+        self.lst_profiles = tk.Listbox(self.master, font=("Helvetica", 15), height=8, width=30)
+        for name in list_profiles():
+            self.lst_profiles.insert(tk.END, name)
+        self.lst_profiles.grid(row=1, column=0, columnspan=2, padx=40)
+
+        # Label used to tell the user what happened
+        self.lbl_status = tk.Label(self.master, text="Choose a profile to load" if self.lst_profiles.size() else "No profiles saved yet, save one after calibrating", font=("Helvetica", 12))
+        self.lbl_status.grid(row=2, column=0, columnspan=2, pady=10)
+
+        self.btn_load = tk.Button(self.master, text="Load", background="orange", font=("Helvetica", 15), width=12, height=2, command=self.load)
+        self.btn_load.grid(row=3, column=0, pady=(0, 20))
+        self.btn_load_and_play = tk.Button(self.master, text="Load and Play", background="light green", font=("Helvetica", 15), width=12, height=2, command=self.load_and_play)
+        self.btn_load_and_play.grid(row=3, column=1, pady=(0, 20))
+
+    # Function that loads the selected profile, returns True if one was loaded
+    def load(self):
+        selection = self.lst_profiles.curselection()
+        if not selection:
+            self.lbl_status.configure(text="Please choose a profile first")
+            return False
+        name = self.lst_profiles.get(selection[0])
+        error = apply_profile(name)
+        if error is not None:
+            self.lbl_status.configure(text=error)
+            return False
+        self.lbl_status.configure(text="Loaded profile '" + name + "'")
+        return True
+
+    def load_and_play(self):
+        if self.load():
+            self.master.destroy()
+            self.open_play_win()
 
 # Class that contains the contents of the keyboard preferences window
 class KeyboardPrefsWindow:
@@ -428,7 +900,7 @@ class KeyboardPrefsWindow:
     
     def change_to_arrow_keys(self):
         global keys_to_use
-        keys_to_use = [Key.up, Key.left, Key.down, Key.right]
+        keys_to_use = ["Key.up", "Key.left", "Key.down", "Key.right"]
         # Debugging purposes
         print(keys_to_use)
 
@@ -499,7 +971,7 @@ class UsingSoftwareWindow:
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Opens the image that will be displayed on screen
-        self.img = ImageTk.PhotoImage(Image.open("main_menu_window.png"))
+        self.img = load_image("main_menu_window.png")
         # Makes a label for the image to be shown in
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
@@ -531,7 +1003,7 @@ class UsingSoftwareWindow:
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("calibration_window.png"))
+        self.img = load_image("calibration_window.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -570,7 +1042,7 @@ the button to save your colour.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("calibration_window2.png"))
+        self.img = load_image("calibration_window2.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -606,7 +1078,7 @@ next stage. Repeat the process for the other colours on your steering wheel.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("calibration_window3.png"))
+        self.img = load_image("calibration_window3.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -643,7 +1115,7 @@ program will think you haven't finished calibrating the software.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("play_window.png"))
+        self.img = load_image("play_window.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=50)
@@ -681,7 +1153,7 @@ to play and then steer your wheel to play.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("keyboard_preferences_window.png"))
+        self.img = load_image("keyboard_preferences_window.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -717,7 +1189,7 @@ class WheelRequirementsWindow:
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("steering_wheel.png"))
+        self.img = load_image("steering_wheel.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -761,7 +1233,7 @@ class UsingWheelWindow:
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("accelerating.png"))
+        self.img = load_image("accelerating.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -793,7 +1265,7 @@ In this case, the colour green is shown.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("braking.png"))
+        self.img = load_image("braking.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -829,7 +1301,7 @@ In this case, the colour red is shown.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("no_braking_or_accelerating.png"))
+        self.img = load_image("no_braking_or_accelerating.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -865,7 +1337,7 @@ those colours. In this case, neither green or red is shown.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("contours_missing.png"))
+        self.img = load_image("contours_missing.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -901,7 +1373,7 @@ In this case, yellow is missing.'''
         self.lbl_title.grid(row=0, column=0, padx=40, pady=20)
 
         # Show the new image
-        self.img = ImageTk.PhotoImage(Image.open("steering.png"))
+        self.img = load_image("steering.png")
         self.lbl_img = tk.Label(self.master, image=self.img, relief="solid")
         # Puts image on screen
         self.lbl_img.grid(row=1, column=0, padx=10)
@@ -923,9 +1395,59 @@ don't rotate past 180 degrees.'''
         self.btn_previous.grid(row=3, column=0, sticky="w", padx=10, pady=10)
 
 def main():
+    # A saved profile can be given to skip calibration and go straight to the play window
+    parser = argparse.ArgumentParser(description="Steering Wheel Application")
+    parser.add_argument("--load-profile", metavar="NAME", help="profile to load before opening the play window")
+    parser.add_argument("--no-warm-up", action="store_true", help="do not load OpenCV and open the camera in the background")
+    parser.add_argument("--startup-time", action="store_true", help="close as soon as the main menu is shown (to time how long it takes)")
+    args = parser.parse_args()
+
     root = tk.Tk() # Represents main window
     app = MainMenuWindow(root) # "root" passed in as the master
-    root.mainloop() # Calls tkinter's mainloop function to make sure windows stay open
+    # Draws the main menu now so the time it takes to appear can be measured
+    root.update()
+    # Measured from when this file started running (Python's own startup is not included)
+    print("Main menu shown after %.0f ms" % ((time.perf_counter() - START_TIME) * 1000))
+    if args.startup_time:
+        root.destroy()
+        return
+
+    # Closing the main menu closes the play window first, so its keys are released before the program exits
+    def close_main_menu():
+        if PlayWindow.open_window is not None:
+            PlayWindow.open_window.close()
+        root.destroy()
+    root.protocol("WM_DELETE_WINDOW", close_main_menu)
+
+    if not args.no_warm_up:
+        # The camera is not warmed up when the play window uses a worker process, as the worker opens the camera itself
+        # (this also stops the warm-up opening the camera while the worker is trying to)
+        open_camera = warm_up_camera and not vision_process
+        # Daemon thread so closing the program does not wait for the camera to open
+        warm_up_thread = threading.Thread(target=warm_up, args=(open_camera,), daemon=True)
+        warm_up_thread.start()
+    if args.load_profile is not None:
+        error = apply_profile(args.load_profile)
+        # Stays on the main menu if the profile could not be loaded
+        if error is not None:
+            print(error)
+            messagebox.showerror("Profile not loaded", error, parent=root)
+        else:
+            app.open_play_win()
+    try:
+        root.mainloop() # Calls tkinter's mainloop function to make sure windows stay open
+    finally:
+        # If the main loop ended any other way (e.g. Ctrl+C) the play window is still open, so its outputs are stopped here
+        play_window = PlayWindow.open_window
+        if play_window is not None:
+            if play_window.worker is not None:
+                play_window.worker.stop()
+            if play_window.image_processor is not None:
+                play_window.output_dispatcher.close()
+    # Closes the camera if it is still open (e.g. being kept warm), if it was ever used
+    if "camera_manager" in sys.modules:
+        from camera_manager import default_manager
+        default_manager.close_all()
 
 # Calls the above function
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+# Runs the steering wheel without any windows: camera in, keys out
+# e.g. "python headless.py default --profile" plays using the saved profile "default" and prints the timings when stopped with Ctrl+C
+import argparse
+# Used to time the decisions and work out the frame rate
+import time
+from vision_worker import DEFAULT_SETTINGS, create_image_processor
+from profiles import load_profile
+from key_output import OutputDispatcher, create_backend
+from decision_filter import DecisionFilter
+from frame_scheduler import FramePacer
+from latency import LatencyStats, format_summary, write_csv
+
+# Function that plays until it is stopped (or the recording or duration ends), returns the LatencyStats and number of frames a second
+def run(calibration, settings, duration=None):
+    profile = load_profile(calibration)
+    colour_ranges = profile["colour_ranges"]
+
+    stats = LatencyStats()
+    # Same camera (or recording) setup as the worker process, see vision_worker.py
+    image_processor = create_image_processor(settings, stats)
+    image_processor.lookup_table = profile["lookup_table"]
+    output_dispatcher = OutputDispatcher(create_backend(settings["output"], profile["keys"]), stats=stats)
+    decision_filter = DecisionFilter(settings["decision_filter"], stats) if settings["decision_filter"] is not None else None
+    pacer = FramePacer(settings["target_fps"], stats)
+
+    start = time.perf_counter()
+    frames = 0
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            pacer.begin()
+            analysis = image_processor.play_frame(*colour_ranges)
+            if analysis is None:
+                # A camera that is still running just had no new frame yet, anything else has run out of frames
+                if getattr(image_processor.cap, "running", False):
+                    continue
+                break
+
+            decision_start = time.perf_counter()
+            if decision_filter is not None:
+                direction, braking, accelerating = decision_filter.update(analysis)
+            else:
+                direction, braking, accelerating = analysis.direction, analysis.braking, analysis.accelerating
+            # Steering is only measured for outputs with a steering axis (e.g. not for the keyboard)
+            steering = analysis.steering if output_dispatcher.wants_steering else 0.0
+            output_dispatcher.update(direction, braking, accelerating, analysis.timestamp, steering)
+            decision_time = time.perf_counter() - decision_start
+            stats.record("contours", analysis.measure_time * 1000)
+            stats.record("decision", (decision_time - analysis.measure_time) * 1000)
+
+            frames += 1
+            pacer.wait(analysis.timestamp)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Releases every key that is still being held
+        output_dispatcher.close()
+        image_processor.cap.release()
+
+    elapsed = time.perf_counter() - start
+    return stats, frames / elapsed if elapsed > 0 else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Play using a saved profile without any windows")
+    parser.add_argument("calibration", help="name of the saved profile to play with (see profiles.py)")
+    parser.add_argument("--source", default="0", help="camera index or path to a recording (default: 0)")
+    parser.add_argument("--output", default=DEFAULT_SETTINGS["output"], choices=["keyboard", "gamepad", "loopback"])
+    parser.add_argument("--analysis-scale", type=float, default=DEFAULT_SETTINGS["analysis_scale"])
+    parser.add_argument("--no-roi-tracking", action="store_true", help="search the whole of every frame")
+    parser.add_argument("--blur-type", default=DEFAULT_SETTINGS["blur_type"])
+    parser.add_argument("--blur-size", type=int, default=DEFAULT_SETTINGS["blur_size"])
+    parser.add_argument("--target-fps", type=float, default=None, help="most frames a second to process")
+    parser.add_argument("--no-filter", action="store_true", help="send each frame's decisions without hysteresis")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to play for (default: until Ctrl+C)")
+    parser.add_argument("--profile", action="store_true", help="print the time taken by each stage on exit")
+    parser.add_argument("--csv", metavar="PATH", help="also save the timings to a CSV file")
+    args = parser.parse_args()
+
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({
+        "source": args.source,
+        "output": args.output,
+        "analysis_scale": args.analysis_scale,
+        "roi_tracking": not args.no_roi_tracking,
+        "blur_type": args.blur_type,
+        "blur_size": args.blur_size,
+        "target_fps": args.target_fps,
+        "decision_filter": None if args.no_filter else DEFAULT_SETTINGS["decision_filter"],
+    })
+
+    print("Playing with profile '" + args.calibration + "', press Ctrl+C to stop")
+    stats, fps = run(args.calibration, settings, args.duration)
+    if args.profile:
+        print("Frames per second: %.1f" % fps)
+        print(format_summary(stats.summary()))
+    if args.csv is not None:
+        write_csv(args.csv, stats.summary())
+
+if __name__ == "__main__":
+    main()
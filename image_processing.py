@@ -1,140 +1,231 @@
 import cv2
 import numpy as np
-from PIL import Image, ImageTk
-# Library that can be used to grab contours
-import imutils
+# Used to time each stage of processing a frame
+import time
+# Function used to share the webcam with any other windows using it
+from camera_manager import acquire_camera
+# Functions and classes used to find the pixels of each colour
+from segmentation import HSVLookupTable, in_hsv_range
+# Class used to only search the area around where the markers were last seen
+from roi_tracking import ROITracker
+# Filters that can be used to remove noise instead of the median blur
+from prefilters import MedianFilter
+# Class holding the result of processing a frame
+from frame_analysis import FrameAnalysis, find_radius_and_centre
+
+# Thresholds (in pixels of the full resolution camera frame) used to check the steering wheel gestures
+RADIUS_THRESHOLD = 15 # Minimum radius for a colour to count as being shown
+DIRECTION_THRESHOLD = 40 # How far apart the x-coordinates of the direction colours must be to steer
+BLUR_SIZE = 15 # Kernel size of the default median blur
 
 class ImageProcessing:
 
-    def __init__(self):
-        self.cap = cv2.VideoCapture(0)
-        self.dir1_mask = None # Will be used to show only direction 1 colour
-        self.dir2_mask = None # Will be used to show only direction 2 colour
-        self.brake_mask = None # Will be used to show only brake colour
-        self.acc_mask = None # Will be used to show only acceleration colour
-
-        # All these contours will be found using the "find_contours" function of this class
-        self.dir1_contours = None
-        self.dir2_contours = None
-        self.brake_contours = None
-        self.acc_contours = None
+    # analysis_scale is the fraction of the camera resolution that colours are found at (e.g. 0.5 or 0.25)
+    # If roi_tracking is True, only the area around where the wheel was last seen is searched
+    # prefilter is the filter used to remove noise (see prefilters.py), a median blur of size 15 by default
+    # stats is a LatencyStats (see latency.py) that the time taken by each stage is recorded in, or None to not record them
+    # capture_settings are the webcam's settings (see frame_sources.py), only used if no source is given
+    # radius_threshold and direction_threshold are the gesture thresholds in pixels of the full resolution frame
+    def __init__(self, source=None, analysis_scale=1.0, roi_tracking=False, prefilter=None, stats=None, capture_settings=None,
+                 radius_threshold=RADIUS_THRESHOLD, direction_threshold=DIRECTION_THRESHOLD):
+        # Frames come from the default webcam unless another source (e.g. a RecordingSource) is given
+        if source is None:
+            # The webcam is read on a background thread so reading a frame never blocks, and only the newest frame is kept
+            # It is shared with (and stays open between) the calibration and play windows, so it is only opened once
+            source = acquire_camera(0, settings=capture_settings)
+        self.cap = source
+
+        # Result of the most recent frame processed by "play_frame" (a FrameAnalysis)
+        self.analysis = None
+
+        # Table compiled from the 4 colour ranges that labels every pixel in one pass (see segmentation.py)
+        self.lookup_table = None
+
+        if prefilter is None:
+            prefilter = MedianFilter(BLUR_SIZE)
+        self.prefilter = prefilter
+
+        self.stats = stats
+
+        # Latest calibration frame and its blurred HSV image, kept so the mask can be redone without a new frame
+        self.calibration_BGR = None
+        self.calibration_HSV = None
+
+        self.roi_tracking = roi_tracking
+        # Window (x0, y0, x1, y1) of the analysis frame that was searched in the latest frame, None if it was the whole frame
+        self.search_window = None
+
+        # Thresholds at full resolution, scaled to the analysis scale by set_analysis_scale
+        self.full_radius_threshold = radius_threshold
+        self.full_direction_threshold = direction_threshold
+
+        # Sets the analysis scale along with the thresholds that depend on it
+        self.set_analysis_scale(analysis_scale)
+
+    # Function that changes the resolution colours are found at, without changing the resolution of the preview
+    def set_analysis_scale(self, analysis_scale):
+        self.analysis_scale = analysis_scale
+        # Thresholds are scaled so the same gestures are detected at every analysis scale (the filter scales its own kernel)
+        self.radius_threshold = self.full_radius_threshold * analysis_scale
+        self.direction_threshold = self.full_direction_threshold * analysis_scale
+        # Tracker works in analysis frame pixels so it is recreated whenever the scale changes
+        self.roi_tracker = ROITracker(min_padding=20 * analysis_scale) if self.roi_tracking else None
+
+    # Function that shrinks the frame to the analysis scale
+    def downscale(self, image_BGR):
+        if self.analysis_scale == 1:
+            return image_BGR
+        # INTER_AREA averages pixels together which gives the best quality when shrinking
+        return cv2.resize(image_BGR, None, fx=self.analysis_scale, fy=self.analysis_scale, interpolation=cv2.INTER_AREA)
+
+    # Function that reads the next frame from the source and mirrors it
+    # Returns None if there is no new frame yet (threaded capture) or there are no frames left (recordings)
+    def read_frame(self):
+        ret, image_BGR = self.cap.read()
+        if not ret:
+            return None
+        # Flipped so the image acts like a mirror for the user
+        return cv2.flip(image_BGR, 1)
     
     # Function that will be used in calibration window
-    def calibration_frame(self, lower_bound, upper_bound):
-        _, image_BGR = self.cap.read()
-        image_BGR = cv2.flip(image_BGR, 1)
-        # Blurs the BGR image using median blur
-        blurred_image = cv2.medianBlur(image_BGR, 15)
-        # Converts blurred image to HSV colour space and stored in self.image_HSV
-        image_HSV = cv2.cvtColor(blurred_image, cv2.COLOR_BGR2HSV)
-        # Parts of HSV image within lower_bound and upper_bound
-        mask = cv2.inRange(image_HSV, lower_bound, upper_bound)
-        # Performs bitwise_and function which overlays the mask on the original BGR image, storing this result in a variable
-        result = cv2.bitwise_and(image_BGR, image_BGR, mask=mask)
-        
-        # Converts the result from BGR to RGBA otherwise image is in wrong colour space (e.g. red colours will look blue)
-        cv2image = cv2.cvtColor(result, cv2.COLOR_BGR2RGBA)
-        # Converts cv2 image to a Pillow image
-        img = Image.fromarray(cv2image)
-        # Creates a PhotoImage of the Pillow image above
-        imgtk = ImageTk.PhotoImage(image=img)
-        
-        # Returns this for the GUI to use
-        return imgtk
+    # Returns the frame and the mask of the parts within the bounds, for the GUI to show using a PreviewRenderer
+    # If frozen is True the last frame is reused, so only the mask is worked out again (a new frame is only read if there is no last frame)
+    def calibration_frame(self, lower_bound, upper_bound, frozen=False):
+        if not frozen or self.calibration_HSV is None:
+            image_BGR = self.read_frame()
+            # Nothing new to show if the camera has not given a new frame or the recording has ended
+            if image_BGR is None:
+                return None
+            # Removes noise from the BGR image (median blur unless another filter was chosen)
+            blurred_image = self.prefilter.filter_image(image_BGR)
+            # Converts blurred image to HSV colour space, both kept for freezing the frame and sampling colours from it
+            self.calibration_HSV = cv2.cvtColor(blurred_image, cv2.COLOR_BGR2HSV)
+            self.calibration_BGR = image_BGR
+        # Parts of HSV image within lower_bound and upper_bound (hue can wrap past 179 if lower hue > upper hue)
+        mask = in_hsv_range(self.calibration_HSV, lower_bound, upper_bound)
+        # Some filters clean up the mask instead of (or as well as) blurring the image
+        if self.prefilter.filters_masks():
+            mask = self.prefilter.filter_mask(mask)
+
+        # Returns these for the GUI to overlay the mask on the original BGR image
+        return self.calibration_BGR, mask
 
     # Function that will be used in play window once colours have been calibrated for
+    # Returns a FrameAnalysis of the new frame, or None if there was no new frame
     def play_frame(self, dir1_HSV, dir2_HSV, brake_HSV, acc_HSV):
-        _, image_BGR = self.cap.read()
-        image_BGR = cv2.flip(image_BGR, 1)
-        blurred_image = cv2.medianBlur(image_BGR, 15)
+        capture_start = time.perf_counter()
+        image_BGR = self.read_frame()
+        if image_BGR is None:
+            return None
+        capture_end = time.perf_counter()
+
+        # Tells the tracker where each marker was in the previous frame so this frame only searches around them
+        if self.roi_tracker is not None and self.analysis is not None:
+            self.update_tracker()
+
+        # Size of the frame that colours are found in
+        analysis_height = int(round(image_BGR.shape[0] * self.analysis_scale))
+        analysis_width = int(round(image_BGR.shape[1] * self.analysis_scale))
+
+        # Asks the tracker which part of the frame needs searching (None means the whole frame)
+        self.search_window = None
+        if self.roi_tracker is not None:
+            self.search_window = self.roi_tracker.search_window((analysis_height, analysis_width))
+
+        if self.search_window is None:
+            # Colours are found in a smaller copy of the frame while the preview still uses the full size frame
+            analysis_BGR = self.downscale(image_BGR)
+        else:
+            x0, y0, x1, y1 = self.search_window
+            # Window is cut out of the full size frame first so only the window has to be shrunk
+            region = image_BGR[int(y0 / self.analysis_scale):int(y1 / self.analysis_scale), int(x0 / self.analysis_scale):int(x1 / self.analysis_scale)]
+            if self.analysis_scale == 1:
+                analysis_BGR = region
+            else:
+                analysis_BGR = cv2.resize(region, (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA)
+
+        blur_start = time.perf_counter()
+        blurred_image = self.prefilter.filter_image(analysis_BGR, self.analysis_scale)
+        hsv_start = time.perf_counter()
         image_HSV = cv2.cvtColor(blurred_image, cv2.COLOR_BGR2HSV)
+        segmentation_start = time.perf_counter()
 
         # ..._HSV = [Numpy array of lower bound, Numpy array of upper bound]
-        self.dir1_mask = cv2.inRange(image_HSV, dir1_HSV[0], dir1_HSV[1])
-        self.dir2_mask = cv2.inRange(image_HSV, dir2_HSV[0], dir2_HSV[1])
-        self.brake_mask = cv2.inRange(image_HSV, brake_HSV[0], brake_HSV[1])
-        self.acc_mask = cv2.inRange(image_HSV, acc_HSV[0], acc_HSV[1])
-
-        # Creates a mask that contains all 4 of the colours
-        resultant_mask = self.dir1_mask + self.dir2_mask + self.brake_mask + self.acc_mask
-
-        result = cv2.bitwise_and(image_BGR, image_BGR, mask=resultant_mask)
-        cv2image = cv2.cvtColor(result, cv2.COLOR_BGR2RGBA)
-        img = Image.fromarray(cv2image)
-        imgtk = ImageTk.PhotoImage(image=img)
-        
-        return imgtk
-
-    # Function used to find the contours in each of the separate colours' masks
+        colour_ranges = [dir1_HSV, dir2_HSV, brake_HSV, acc_HSV]
+        # Lookup table only needs compiling again if the colour ranges have changed (normally compiled once by calibration)
+        if self.lookup_table is None or not self.lookup_table.matches(colour_ranges):
+            self.lookup_table = HSVLookupTable(colour_ranges)
+
+        # Labels every pixel with its colour(s) in a single pass instead of calling inRange 4 times
+        label_image = self.lookup_table.label(image_HSV)
+        # Labels from the window are placed in an otherwise empty image so positions are the same as a full search
+        if self.search_window is not None:
+            window_labels = label_image
+            label_image = np.zeros((analysis_height, analysis_width), dtype=np.uint8)
+            label_image[y0:y1, x0:x1] = window_labels
+
+        # Morphological filters are applied to each colour's mask, so the labelled image is rebuilt from the filtered masks
+        if self.prefilter.filters_masks():
+            masks = [self.prefilter.filter_mask(self.lookup_table.mask(label_image, i), self.analysis_scale) for i in range(4)]
+            label_image = masks[0] | masks[1] | masks[2] | masks[3]
+        segmentation_end = time.perf_counter()
+
+        # Records how long each stage took (in milliseconds)
+        if self.stats is not None:
+            self.stats.frames += 1
+            # Number of frames the threaded capture dropped because they were replaced by newer ones
+            self.stats.dropped_frames = getattr(self.cap, "frames_dropped", 0)
+            # Reading the frame, updating the tracker and shrinking or cutting out the search window all count as capture
+            self.stats.record("capture", (blur_start - capture_start) * 1000)
+            if self.cap.timestamp is not None:
+                self.stats.record("frame age", (capture_end - self.cap.timestamp) * 1000)
+            self.stats.record("blur", (hsv_start - blur_start) * 1000)
+            self.stats.record("hsv", (segmentation_start - hsv_start) * 1000)
+            self.stats.record("segmentation", (segmentation_end - segmentation_start) * 1000)
+
+        # Everything else (masks, contours, decisions and the preview mask) is only worked out when it is first used
+        self.analysis = FrameAnalysis(image_BGR, label_image, timestamp=self.cap.timestamp, search_window=self.search_window,
+                                      radius_threshold=self.radius_threshold,
+                                      direction_threshold=self.direction_threshold)
+        return self.analysis
+
+    # Function used to find the contours in each of the separate colours' masks of the latest frame
+    # Returns them in the order dir1, dir2, brake, acc
     def find_contours(self):
-        # Contours found using OpenCV's function "findContours"
-        self.dir1_contours = cv2.findContours(self.dir1_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        # Contours grabbed to be stored using imutils' function "grab_contours"
-        self.dir1_contours = imutils.grab_contours(self.dir1_contours)
-        
-        self.dir2_contours = cv2.findContours(self.dir2_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        self.dir2_contours = imutils.grab_contours(self.dir2_contours)
-
-        self.brake_contours = cv2.findContours(self.brake_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        self.brake_contours = imutils.grab_contours(self.brake_contours)
-
-        self.acc_contours = cv2.findContours(self.acc_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        self.acc_contours = imutils.grab_contours(self.acc_contours)
+        return [self.analysis.contours(i) for i in range(4)]
+
+    # Function that gives the ROI tracker the centre and radius of each colour in the latest frame
+    # Only colours that were measured for the decisions are used, so the tracker never measures a colour itself
+    # (a colour that was not needed, e.g. the bottom direction colour when the top one is missing, is left where it was)
+    def update_tracker(self):
+        for i in range(4):
+            if not self.analysis.is_measured(i):
+                continue
+            measurement = self.analysis.measure(i)
+            # Small blobs are treated as noise, the same as in the "check_..." functions
+            if measurement is not None and measurement[0] > self.radius_threshold:
+                radius, centre = measurement
+                self.roi_tracker.update(i, centre, radius)
+            else:
+                self.roi_tracker.lose(i)
 
     # Function to find radius and centre of contours
     def find_radius_and_centre(self, contours):
-        # Finds the largest contour by area of, for example, brake_contours
-        c = max(contours, key=cv2.contourArea)
-        # Finds the minimum enclosing circle of that biggest contour and gets the centre coordinates and radius of circle
-        ((centre), radius) = cv2.minEnclosingCircle(c)
+        return find_radius_and_centre(contours)
 
-        return radius, centre
+    # Function that returns the radius and centre of the largest blob of a colour (0 = dir1, 1 = dir2, 2 = brake, 3 = acc)
+    # Returns None if the colour is not in the latest frame
+    def measure_colour(self, colour_index):
+        return self.analysis.measure(colour_index)
 
-    # Function which returns True if accelerating colour is shown, otherwise False
+    # Function which returns True if accelerating colour is shown in the latest frame, otherwise False
     def check_acceleration(self):
-        # Checks if the length of the acceleration contours is more than 0 suggesting acceleration colour could be being shown by user
-        if len(self.acc_contours) > 0:
-            # Uses "find_radius_and_centre" function to find the radius and centre
-            radius, centre = self.find_radius_and_centre(self.acc_contours)
+        return self.analysis.accelerating
 
-            # If radius is larger than 15 then this suggest user is showing their acceleration colour
-            if radius > 15:
-                return True
-        return False
-
-    # Function which returns True if braking colour is shown, otherwise False
+    # Function which returns True if braking colour is shown in the latest frame, otherwise False
     def check_braking(self):
-        # Same logic from "check_acceleration" function except with the braking contours
-        if len(self.brake_contours) > 0:
-            radius, centre = self.find_radius_and_centre(self.brake_contours)
+        return self.analysis.braking
 
-            if radius > 15:
-                return True
-        return False
-    
-    # Function which returns string of direction to turn if both direction colours are in frame
+    # Function which returns string of direction to turn if both direction colours are in the latest frame
     def check_direction(self):
-        # If the lengths of both direction contours are more than 0 then the steering direction can be determined
-        if len(self.dir1_contours) > 0 and len(self.dir2_contours) > 0:
-            # FInds radii and centres of direction contours
-            dir1_radius, dir1_centre = self.find_radius_and_centre(self.dir1_contours)
-
-            dir2_radius, dir2_centre = self.find_radius_and_centre(self.dir2_contours)
-
-            # If both radii are more than 15 then it suggests both direction colours are in frame so that a direction can be determined
-            if dir1_radius > 15 and dir2_radius > 15:
-                # If the x-coordinate of the top colour is less than that of the bottom colour minus 40 (threshold)
-                if dir1_centre[0] < (dir2_centre[0] - 40):
-                    # Suggests user wants to steer left
-                    return "LEFT"
-                # Otherwise if the x-coordinate of the bottom colour is less than that of the top colour minus 40 (threshold)
-                elif dir2_centre[0] < (dir1_centre[0] - 40):
-                    # Suggests user wants to steer right
-                    return "RIGHT"
-                # Otherwise
-                else:
-                    # Suggests user wants to drive straight
-                    return "STRAIGHT"
-        
-        # Returns message if at least one of the direction colours is missing from the frame
-        return "Contour(s) missing"
\ No newline at end of file
+        return self.analysis.direction
@@ -0,0 +1,261 @@
+# Used to send the outputs on their own thread
+import threading
+import queue
+# Used to timestamp every output event
+import time
+# Used to keep only the most recent output events
+from collections import deque
+# Used to make sure outputs are released when the program closes
+import atexit
+
+# Position of each control in the output state (the same order as keys_to_use, then the analog steering value)
+ACCELERATE = 0
+LEFT = 1
+BRAKE = 2
+RIGHT = 3
+STEERING = 4
+
+# Names of the controls, used in the event logs
+CONTROL_NAMES = ["accelerate", "left", "brake", "right", "steering"]
+
+# State with nothing pressed and the wheel straight
+RELEASED_STATE = (False, False, False, False, 0.0)
+
+# Function that turns the gestures found in a frame into the output state [accelerate, left, brake, right, steering]
+# direction is "LEFT", "RIGHT", "STRAIGHT" or "Contour(s) missing", is_braking and is_accelerating are True or False
+# steering is how far the wheel is turned from -1 (left) to 1 (right), rounded so tiny movements are not sent
+def output_state(direction, is_braking, is_accelerating, steering=0.0):
+    return (bool(is_accelerating), direction == "LEFT", bool(is_braking), direction == "RIGHT", round(float(steering), 2))
+
+# Function that turns a key into text that can be saved (e.g. Key.up becomes "Key.up" and "w" stays "w")
+def key_to_text(key):
+    if isinstance(key, str):
+        return key
+    return "Key." + key.name
+
+# Function that turns text saved with key_to_text back into a key (keys that are not text are returned as they are)
+def text_to_key(text):
+    if isinstance(text, str) and text.startswith("Key.") and len(text) > 4:
+        # Imported here so keys can be kept as text without pynput (e.g. when using the gamepad output)
+        from pynput.keyboard import Key
+        return Key[text[4:]]
+    return text
+
+# Output backend that presses keyboard keys (the four keys in keys_to_use) using pynput
+class KeyboardBackend:
+
+    name = "keyboard"
+    # Keys cannot be partly pressed, so the left and right keys are used instead of an analog steering value
+    analog_steering = False
+
+    # keys = [accelerate key, left key, brake key, right key], as pynput keys or text saved with key_to_text
+    def __init__(self, keys):
+        # Imported here so the other backends can be used without pynput
+        from pynput.keyboard import Controller
+        # Set up the keyboard controller for keyboard presses
+        self.keyboard = Controller()
+        self.keys = [text_to_key(key) for key in keys]
+
+    # Functions that press or release the key for a control
+    def press(self, control):
+        self.keyboard.press(self.keys[control])
+
+    def release(self, control):
+        self.keyboard.release(self.keys[control])
+
+    def set_steering(self, value):
+        pass
+
+    def close(self):
+        pass
+
+# Output backend that creates a virtual gamepad using Linux's uinput (needs the "evdev" package and access to /dev/uinput)
+# Steering is an analog stick axis and the throttle and brake are the right and left triggers
+class GamepadBackend:
+
+    name = "gamepad"
+    analog_steering = True
+
+    def __init__(self, device_name="Steering Wheel App Gamepad"):
+        # Imported here as it is only available on Linux
+        from evdev import UInput, AbsInfo, ecodes
+        self.ecodes = ecodes
+        capabilities = {
+            # AbsInfo(value, min, max, fuzz, flat, resolution)
+            ecodes.EV_ABS: [(ecodes.ABS_X, AbsInfo(0, -32767, 32767, 0, 0, 0)),
+                            (ecodes.ABS_Z, AbsInfo(0, 0, 255, 0, 0, 0)),
+                            (ecodes.ABS_RZ, AbsInfo(0, 0, 255, 0, 0, 0))],
+            # The buttons are pressed along with the triggers, and are needed for games to see the device as a gamepad
+            ecodes.EV_KEY: [ecodes.BTN_TL2, ecodes.BTN_TR2],
+        }
+        self.device = UInput(capabilities, name=device_name)
+        # Trigger axis and button of each control
+        self.triggers = {ACCELERATE: (ecodes.ABS_RZ, ecodes.BTN_TR2), BRAKE: (ecodes.ABS_Z, ecodes.BTN_TL2)}
+
+    def press(self, control):
+        self.set_trigger(control, True)
+
+    def release(self, control):
+        self.set_trigger(control, False)
+
+    # Function that fully presses or releases a trigger (the left and right controls use the steering axis instead)
+    def set_trigger(self, control, pressed):
+        if control not in self.triggers:
+            return
+        axis, button = self.triggers[control]
+        self.device.write(self.ecodes.EV_ABS, axis, 255 if pressed else 0)
+        self.device.write(self.ecodes.EV_KEY, button, 1 if pressed else 0)
+        self.device.syn()
+
+    # Function that moves the steering axis (-1 is fully left, 1 is fully right)
+    def set_steering(self, value):
+        self.device.write(self.ecodes.EV_ABS, self.ecodes.ABS_X, int(value * 32767))
+        self.device.syn()
+
+    def close(self):
+        self.device.close()
+
+# Output backend that only records what it is told to do, so outputs can be checked and timed without a game or device
+class LoopbackBackend:
+
+    name = "loopback"
+    analog_steering = True
+
+    def __init__(self):
+        # Each event is (time received, control name, value)
+        self.events = []
+        # Current value of every control
+        self.state = list(RELEASED_STATE)
+
+    def press(self, control):
+        self.record(control, True)
+
+    def release(self, control):
+        self.record(control, False)
+
+    def set_steering(self, value):
+        self.record(STEERING, value)
+
+    def record(self, control, value):
+        self.state[control] = value
+        self.events.append((time.perf_counter(), CONTROL_NAMES[control], value))
+
+    def close(self):
+        pass
+
+# Function that creates an output backend from its name ("keyboard", "gamepad" or "loopback")
+def create_backend(name, keys):
+    if name == "keyboard":
+        return KeyboardBackend(keys)
+    elif name == "gamepad":
+        return GamepadBackend()
+    elif name == "loopback":
+        return LoopbackBackend()
+    raise ValueError("Unknown output: " + str(name))
+
+# Class that sends the steering wheel gestures to an output backend
+# Only changes are sent (a key is pressed once when it should be held and released once when it should not),
+# and they are sent from a separate thread so the image processing never waits for the output
+class OutputDispatcher:
+
+    # stats is a LatencyStats (see latency.py) to record the key emission and end to end times in, or None
+    def __init__(self, backend, history=1000, stats=None):
+        # Backend that the outputs are sent to (e.g. a KeyboardBackend)
+        self.backend = backend
+        self.stats = stats
+
+        # State the last time a state was given to "set_state" (used to skip states that have not changed)
+        self.requested_state = RELEASED_STATE
+        # State actually sent to the backend (only changed by the dispatch thread)
+        self.sent_state = list(RELEASED_STATE)
+
+        # Each event is (time sent, control name, value, time the frame was captured)
+        self.events = deque(maxlen=history)
+
+        # States waiting to be sent by the dispatch thread (None tells the thread to stop)
+        self.pending = queue.Queue()
+        # Lock so the state is never sent from two threads at once
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self.dispatch_loop, daemon=True)
+        self.thread.start()
+
+        # Outputs are released even if the program exits without calling "close"
+        atexit.register(self.close)
+
+    # True if the backend has a steering axis, so the steering value is only worked out when it will be used
+    @property
+    def wants_steering(self):
+        return self.backend.analog_steering
+
+    # Function that sends the gestures found in a frame
+    def update(self, direction, is_braking, is_accelerating, frame_timestamp=None, steering=0.0):
+        # Steering is kept at 0 for backends without a steering axis so its changes are not queued for nothing
+        if not self.backend.analog_steering:
+            steering = 0.0
+        self.set_state(output_state(direction, is_braking, is_accelerating, steering), frame_timestamp)
+
+    # Function that gives the dispatcher the state the outputs should be in
+    def set_state(self, state, frame_timestamp=None):
+        state = tuple(state)
+        # Nothing to do if no output needs to change
+        if state == self.requested_state or not self.running:
+            return
+        self.requested_state = state
+        self.pending.put((state, frame_timestamp))
+
+    # Function run on the dispatch thread which sends the changes to the backend
+    def dispatch_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            state, frame_timestamp = item
+            self.apply_state(state, frame_timestamp)
+
+    # Function that sends only the controls whose state has changed
+    def apply_state(self, state, frame_timestamp=None):
+        with self.lock:
+            for i in range(len(state)):
+                if state[i] == self.sent_state[i]:
+                    continue
+                start = time.perf_counter()
+                if i == STEERING:
+                    self.backend.set_steering(state[i])
+                elif state[i]:
+                    self.backend.press(i)
+                else:
+                    self.backend.release(i)
+                sent = time.perf_counter()
+                self.sent_state[i] = state[i]
+                self.events.append((sent, CONTROL_NAMES[i], state[i], frame_timestamp))
+                if self.stats is not None:
+                    self.stats.record("key emission", (sent - start) * 1000)
+                    if frame_timestamp is not None:
+                        self.stats.record("end to end", (sent - frame_timestamp) * 1000)
+
+    # Function that returns the time (in seconds) from each frame being captured to its output being sent
+    def latencies(self):
+        return [sent - captured for sent, _, _, captured in list(self.events) if captured is not None]
+
+    # Keys (or buttons) that are currently being held, as control names
+    @property
+    def held(self):
+        return [CONTROL_NAMES[i] for i in range(STEERING) if self.sent_state[i]]
+
+    # Function that releases every output
+    def release_all(self):
+        self.set_state(RELEASED_STATE)
+
+    # Function that releases every output and stops the dispatch thread (safe to call more than once)
+    def close(self):
+        if not self.running:
+            return
+        self.release_all()
+        self.running = False
+        self.pending.put(None)
+        self.thread.join(timeout=1.0)
+        # Anything still held (e.g. if the thread did not finish in time) is released here instead
+        self.apply_state(RELEASED_STATE)
+        self.backend.close()
+        atexit.unregister(self.close)
@@ -0,0 +1,78 @@
+# Used to keep only the most recent timings of each stage
+from collections import deque
+# Used to save the timings to a CSV file
+import csv
+# Timings are recorded from the output thread as well as the thread processing the frames
+import threading
+
+# Stages of processing a frame, in the order they happen
+# "frame age" is how old the frame was when processing started and "end to end" is from the frame being captured to its key being sent
+STAGES = ["capture", "frame age", "blur", "hsv", "segmentation", "contours", "decision", "key emission", "preview", "end to end"]
+
+# Class that keeps the recent timings (in milliseconds) of each stage and works out their percentiles
+class LatencyStats:
+
+    # history is how many of the most recent timings of each stage are kept
+    def __init__(self, history=300):
+        self.history = history
+        self.samples = {stage: deque(maxlen=history) for stage in STAGES}
+        self.lock = threading.Lock()
+        # Number of frames processed and number the camera captured but were never processed
+        self.frames = 0
+        self.dropped_frames = 0
+        # Number of frames that took longer than their budget (see frame_scheduler.py)
+        self.missed_deadlines = 0
+        # Number of output changes smoothed away by the decision filter (see decision_filter.py)
+        self.suppressed_transitions = 0
+
+    # Function that stores how long a stage took
+    def record(self, stage, milliseconds):
+        with self.lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.history)
+            self.samples[stage].append(milliseconds)
+
+    # Function that returns the p50, p95 and p99 (in ms) of a stage, or None if it has no timings yet
+    def percentiles(self, stage):
+        with self.lock:
+            values = sorted(self.samples.get(stage, ()))
+        if not values:
+            return None
+        # Nearest-rank percentile
+        return tuple(values[min(len(values) - 1, int(q * len(values)))] for q in (0.5, 0.95, 0.99))
+
+    # Function that returns every stage's timings as a dictionary that can be sent between processes or saved
+    def summary(self):
+        stages = {}
+        with self.lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        for stage, values in samples.items():
+            result = self.percentiles(stage)
+            if result is None or not values:
+                continue
+            stages[stage] = {"count": len(values), "mean": sum(values) / len(values), "p50": result[0], "p95": result[1], "p99": result[2]}
+        return {"frames": self.frames, "dropped_frames": self.dropped_frames, "missed_deadlines": self.missed_deadlines,
+                "suppressed_transitions": self.suppressed_transitions, "stages": stages}
+
+# Function that turns a summary into lines of text to show in the play window
+def format_summary(summary):
+    lines = ["Frames: " + str(summary["frames"]) + "   Dropped: " + str(summary["dropped_frames"]) + "   Missed: " + str(summary["missed_deadlines"]),
+             "Suppressed changes: " + str(summary["suppressed_transitions"])]
+    lines.append("Stage (ms)".ljust(14) + "".join(key.rjust(8) for key in ("p50", "p95", "p99")))
+    for stage in STAGES:
+        if stage in summary["stages"]:
+            values = summary["stages"][stage]
+            lines.append(stage.ljust(14) + "".join(("%.2f" % values[key]).rjust(8) for key in ("p50", "p95", "p99")))
+    return "\n".join(lines)
+
+# Function that saves a summary to a CSV file so timings from different cameras and settings can be compared
+def write_csv(path, summary):
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+        for stage, values in summary["stages"].items():
+            writer.writerow([stage, values["count"], values["mean"], values["p50"], values["p95"], values["p99"]])
+        writer.writerow(["frames", summary["frames"], "", "", "", ""])
+        writer.writerow(["dropped_frames", summary["dropped_frames"], "", "", "", ""])
+        writer.writerow(["missed_deadlines", summary["missed_deadlines"], "", "", "", ""])
+        writer.writerow(["suppressed_transitions", summary["suppressed_transitions"], "", "", "", ""])
@@ -0,0 +1,112 @@
+# Runs several steering wheels at once (e.g. for local multiplayer), each with its own camera or recording, profile and keys
+# Each wheel runs in its own worker process (see vision_worker.py) and this file reports how each one is doing
+# e.g. "python multi_wheel.py wheels.json" where wheels.json contains
+# {"pipelines": [{"name": "Player 1", "source": 0, "profile": "alice"},
+#                {"name": "Player 2", "source": 1, "profile": "bob", "keys": ["i", "j", "k", "l"]}]}
+# Any other worker setting (e.g. "output", "analysis_scale" or "cpu") can be given for each wheel as well
+import argparse
+# Used to read the configuration file
+import json
+# Used to give each worker its own core
+import os
+import time
+from vision_worker import VisionWorker
+from profiles import load_profile
+
+# Worker settings that are part of a pipeline's configuration but are not passed to the worker
+PIPELINE_KEYS = ["name", "profile", "keys"]
+
+# Stages that make up the time taken to process a frame (see latency.py)
+PROCESSING_STAGES = ["capture", "blur", "hsv", "segmentation", "contours", "decision"]
+
+# Class that starts a worker process for every wheel and reports each one's frame rate and latency
+class PipelineSupervisor:
+
+    # pipelines is a list of dictionaries, each with a "profile", and optionally a "name", "keys" (which replace the
+    # profile's keys) and any worker settings
+    # If pin_cores is True each worker is kept on its own CPU core (where the operating system allows it)
+    def __init__(self, pipelines, pin_cores=True):
+        self.names = []
+        self.workers = []
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        for i, pipeline in enumerate(pipelines):
+            profile = load_profile(pipeline["profile"])
+            # Keys are kept as text (e.g. "Key.up") until the keyboard output is created in the worker
+            keys = pipeline.get("keys", profile["keys"])
+
+            settings = {name: value for name, value in pipeline.items() if name not in PIPELINE_KEYS}
+            # Nobody is looking at the previews
+            settings["show_preview"] = False
+            if pin_cores and cores and "cpu" not in settings:
+                settings["cpu"] = cores[i % len(cores)]
+
+            self.names.append(pipeline.get("name", "Wheel " + str(i + 1)))
+            self.workers.append(VisionWorker(settings, profile["colour_ranges"], keys))
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    # Function that returns a dictionary for each wheel with its frame rate, frames processed and latency (in ms)
+    def report(self):
+        rows = []
+        for name, worker in zip(self.names, self.workers):
+            decision = worker.latest_decision()
+            summary = worker.latest_stats()
+            row = {"name": name, "alive": worker.is_alive(), "fps": decision["fps"] if decision is not None else 0.0,
+                   "frames": 0, "dropped_frames": 0, "processing_p50": None, "end_to_end_p50": None, "end_to_end_p95": None}
+            if summary is not None:
+                stages = summary["stages"]
+                row["frames"] = summary["frames"]
+                row["dropped_frames"] = summary["dropped_frames"]
+                # Sum of the middle time of each stage (an estimate of the time taken to process a typical frame)
+                row["processing_p50"] = sum(stages[stage]["p50"] for stage in PROCESSING_STAGES if stage in stages)
+                # Only known once outputs have changed
+                if "end to end" in stages:
+                    row["end_to_end_p50"] = stages["end to end"]["p50"]
+                    row["end_to_end_p95"] = stages["end to end"]["p95"]
+            rows.append(row)
+        return rows
+
+    # True while any wheel is still running
+    def any_alive(self):
+        return any(worker.is_alive() for worker in self.workers)
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+# Function that turns a report into lines of text
+def format_report(rows):
+    def milliseconds(value):
+        return ("%.1f" % value) if value is not None else "-"
+    lines = ["Wheel".ljust(16) + "FPS".rjust(7) + "Frames".rjust(9) + "Dropped".rjust(9) + "Process p50".rjust(13) + "E2E p50".rjust(9) + "E2E p95".rjust(9)]
+    for row in rows:
+        name = row["name"] if row["alive"] else row["name"] + " (stopped)"
+        lines.append(name[:15].ljust(16) + ("%.1f" % row["fps"]).rjust(7) + str(row["frames"]).rjust(9) + str(row["dropped_frames"]).rjust(9)
+                     + milliseconds(row["processing_p50"]).rjust(13) + milliseconds(row["end_to_end_p50"]).rjust(9) + milliseconds(row["end_to_end_p95"]).rjust(9))
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several steering wheels at once")
+    parser.add_argument("config", help="JSON file listing the wheels (see the top of this file)")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between reports")
+    parser.add_argument("--no-pinning", action="store_true", help="let the operating system choose which cores the workers use")
+    args = parser.parse_args()
+
+    with open(args.config) as file:
+        pipelines = json.load(file)["pipelines"]
+    supervisor = PipelineSupervisor(pipelines, pin_cores=not args.no_pinning)
+    supervisor.start()
+    print("Running " + str(len(pipelines)) + " wheel(s), press Ctrl+C to stop")
+    try:
+        while supervisor.any_alive():
+            time.sleep(args.interval)
+            print(format_report(supervisor.report()) + "\n")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# Replays labelled recordings through the image processing with every combination of a grid of settings,
+# and reports how often each combination gets the right answer and how long it takes per frame
+# e.g. "python parameter_sweep.py session.npz --calibration default --radius 10 15 20 --blur 5 15"
+#
+# Each recording needs a labels file next to it called "<recording>.labels.json" containing
+# {"labels": [["LEFT", false, true], ["STRAIGHT", true, false], null, ...]}
+# with one [direction, braking, accelerating] per frame (null for frames that should not be scored)
+import argparse
+# Used to try every combination of the settings
+import itertools
+# Used to read the labels and save the results
+import json
+# Used to time each frame
+import time
+# Used to run the combinations on every CPU core
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from frame_sources import RecordingSource
+from image_processing import ImageProcessing, RADIUS_THRESHOLD, DIRECTION_THRESHOLD, BLUR_SIZE
+from prefilters import create_prefilter
+from segmentation import HSVLookupTable, HUE_VALUES
+from profiles import load_profile
+
+# Function that returns the labels of a recording (see the top of this file)
+def load_labels(recording_path):
+    with open(recording_path + ".labels.json") as file:
+        return json.load(file)["labels"]
+
+# Function that widens (or narrows, if negative) the saturation and value of a colour range by sv_margin,
+# and widens the hue by hue_margin on each side (hue ranges can wrap past 179, see segmentation.py)
+def adjust_range(lower, upper, hue_margin=0, sv_margin=0):
+    lower = np.array(lower, dtype=np.int64)
+    upper = np.array(upper, dtype=np.int64)
+    if hue_margin > 0:
+        # Number of hues covered, counting ranges that wrap past 179
+        span = (upper[0] - lower[0]) % HUE_VALUES + 1
+        if span + 2 * hue_margin >= HUE_VALUES:
+            lower[0], upper[0] = 0, HUE_VALUES - 1
+        else:
+            lower[0] = (lower[0] - hue_margin) % HUE_VALUES
+            upper[0] = (upper[0] + hue_margin) % HUE_VALUES
+    lower[1:] = np.clip(lower[1:] - sv_margin, 0, 255)
+    upper[1:] = np.clip(upper[1:] + sv_margin, 0, 255)
+    # A range narrowed past nothing keeps just its middle value
+    middle = (lower[1:] + upper[1:]) // 2
+    crossed = lower[1:] > upper[1:]
+    lower[1:][crossed] = middle[crossed]
+    upper[1:][crossed] = middle[crossed]
+    return lower, upper
+
+# Function that returns every combination of the given values as a list of dictionaries
+def parameter_grid(radius_thresholds, direction_thresholds, blur_sizes, hsv_margins, hue_margins):
+    names = ["radius_threshold", "direction_threshold", "blur_size", "hsv_margin", "hue_margin"]
+    return [dict(zip(names, values)) for values in itertools.product(radius_thresholds, direction_thresholds, blur_sizes, hsv_margins, hue_margins)]
+
+# Function run in a worker process that replays one recording with one combination of settings
+# settings holds the fixed settings (blur_type, analysis_scale, and roi_tracking)
+def evaluate(recording_path, labels, colour_ranges, params, settings):
+    colour_ranges = [adjust_range(lower, upper, params["hue_margin"], params["hsv_margin"]) for lower, upper in colour_ranges]
+    image_processor = ImageProcessing(source=RecordingSource(recording_path), analysis_scale=settings["analysis_scale"],
+                                      roi_tracking=settings["roi_tracking"],
+                                      prefilter=create_prefilter(settings["blur_type"], params["blur_size"]),
+                                      radius_threshold=params["radius_threshold"], direction_threshold=params["direction_threshold"])
+    image_processor.lookup_table = HSVLookupTable(colour_ranges)
+
+    # Number of scored frames and how many had each control (and all of them) right
+    scored = 0
+    correct = {"direction": 0, "braking": 0, "accelerating": 0, "all": 0}
+    total_time = 0.0
+    frame_count = 0
+    for label in labels:
+        start = time.perf_counter()
+        analysis = image_processor.play_frame(*colour_ranges)
+        if analysis is None:
+            break
+        decisions = (analysis.direction, analysis.braking, analysis.accelerating)
+        total_time += time.perf_counter() - start
+        frame_count += 1
+        if label is None:
+            continue
+        scored += 1
+        matches = [bool(decision == expected) for decision, expected in zip(decisions, label)]
+        for name, match in zip(["direction", "braking", "accelerating"], matches):
+            correct[name] += match
+        correct["all"] += all(matches)
+    image_processor.cap.release()
+
+    result = {"recording": recording_path, "frames": frame_count, "scored_frames": scored,
+              "ms_per_frame": 1000 * total_time / frame_count if frame_count else None}
+    result.update(params)
+    for name, count in correct.items():
+        result[name + "_accuracy"] = count / scored if scored else None
+    return result
+
+# Function that runs every combination on every recording using a pool of processes
+# Returns one result per combination, combining the recordings (weighted by the number of scored frames)
+def sweep(recording_paths, colour_ranges, grid, settings, workers=None):
+    labels = {path: load_labels(path) for path in recording_paths}
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(evaluate, path, labels[path], colour_ranges, params, settings)
+                   for params in grid for path in recording_paths]
+        for future in as_completed(futures):
+            result = future.result()
+            key = tuple(result[name] for name in grid[0])
+            results.setdefault(key, []).append(result)
+
+    combined = []
+    for key, runs in results.items():
+        scored = sum(run["scored_frames"] for run in runs)
+        frames = sum(run["frames"] for run in runs)
+        summary = dict(zip(grid[0].keys(), key))
+        summary["frames"] = frames
+        summary["ms_per_frame"] = sum(run["ms_per_frame"] * run["frames"] for run in runs if run["frames"]) / frames if frames else None
+        for name in ["direction", "braking", "accelerating", "all"]:
+            summary[name + "_accuracy"] = sum(run[name + "_accuracy"] * run["scored_frames"] for run in runs if run["scored_frames"]) / scored if scored else None
+        combined.append(summary)
+    # Most accurate first, then the cheapest
+    combined.sort(key=lambda summary: (-(summary["all_accuracy"] or 0), summary["ms_per_frame"] or 0))
+    return combined
+
+def main():
+    parser = argparse.ArgumentParser(description="Try a grid of settings on labelled recordings")
+    parser.add_argument("recordings", nargs="+", help="recordings (.npz or video) with a .labels.json file next to each")
+    parser.add_argument("--calibration", required=True, help="saved profile with the colour ranges to use (see profiles.py)")
+    parser.add_argument("--radius", type=float, nargs="+", default=[RADIUS_THRESHOLD], help="radius thresholds to try")
+    parser.add_argument("--direction", type=float, nargs="+", default=[DIRECTION_THRESHOLD], help="direction thresholds to try")
+    parser.add_argument("--blur", type=int, nargs="+", default=[BLUR_SIZE], help="blur sizes to try")
+    parser.add_argument("--hsv-margin", type=int, nargs="+", default=[0], help="amounts to widen (or narrow) saturation and value by")
+    parser.add_argument("--hue-margin", type=int, nargs="+", default=[0], help="amounts to widen hue by")
+    parser.add_argument("--blur-type", default="median")
+    parser.add_argument("--analysis-scale", type=float, default=1.0)
+    parser.add_argument("--roi-tracking", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: one per CPU core)")
+    parser.add_argument("--output", metavar="PATH", help="save every result to a JSON file")
+    args = parser.parse_args()
+
+    colour_ranges = load_profile(args.calibration)["colour_ranges"]
+    grid = parameter_grid(args.radius, args.direction, args.blur, args.hsv_margin, args.hue_margin)
+    settings = {"blur_type": args.blur_type, "analysis_scale": args.analysis_scale,
+                "roi_tracking": args.roi_tracking}
+    print("Trying " + str(len(grid)) + " combinations on " + str(len(args.recordings)) + " recording(s)")
+    results = sweep(args.recordings, colour_ranges, grid, settings, args.workers)
+
+    print("Radius  Direction  Blur  HSV  Hue   Accuracy  Direction  Brake  Accelerate  ms/frame")
+    for result in results:
+        print(("%.0f" % result["radius_threshold"]).rjust(6) + ("%.0f" % result["direction_threshold"]).rjust(11)
+              + str(result["blur_size"]).rjust(6) + str(result["hsv_margin"]).rjust(5) + str(result["hue_margin"]).rjust(5)
+              + ("%.3f" % (result["all_accuracy"] or 0)).rjust(11) + ("%.3f" % (result["direction_accuracy"] or 0)).rjust(11)
+              + ("%.3f" % (result["braking_accuracy"] or 0)).rjust(7) + ("%.3f" % (result["accelerating_accuracy"] or 0)).rjust(12)
+              + ("%.2f" % (result["ms_per_frame"] or 0)).rjust(10))
+
+    # Results are sorted so the first is the cheapest of the most accurate combinations
+    if results:
+        print("Cheapest of the most accurate:", {name: results[0][name] for name in grid[0]})
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Module used for the blurs and morphological operations
+import cv2
+# Used to measure how long each filter takes
+import time
+# Used to keep the costs of only the most recent frames
+from collections import deque
+
+# Function that scales a kernel size (given in full resolution pixels) making sure it stays an odd number of at least 1
+def scaled_size(size, scale):
+    return max(1, int(round(size * scale)) | 1)
+
+# Base class for the filters that remove noise before (or after) colours are found
+# Subclasses change "blur" to filter the BGR image and/or "clean_mask" to filter each colour's mask
+class PreFilter:
+
+    name = "none"
+
+    def __init__(self, history=100):
+        # Time (in milliseconds) spent filtering each of the most recent frames
+        self.costs = deque(maxlen=history)
+
+    # Function that filters the BGR image and records how long it took
+    def filter_image(self, image_BGR, scale=1.0):
+        start = time.perf_counter()
+        result = self.blur(image_BGR, scale)
+        self.costs.append((time.perf_counter() - start) * 1000)
+        return result
+
+    # Function that filters a colour mask, adding the time taken to the cost of the current frame
+    def filter_mask(self, mask, scale=1.0):
+        start = time.perf_counter()
+        result = self.clean_mask(mask, scale)
+        if self.costs:
+            self.costs[-1] += (time.perf_counter() - start) * 1000
+        return result
+
+    # Function that returns True if this filter changes the masks (so they need filtering)
+    def filters_masks(self):
+        return False
+
+    # Average time in milliseconds this filter has taken per frame
+    def cost_per_frame(self):
+        if not self.costs:
+            return 0.0
+        return sum(self.costs) / len(self.costs)
+
+    # No filtering is done by default
+    def blur(self, image_BGR, scale):
+        return image_BGR
+
+    def clean_mask(self, mask, scale):
+        return mask
+
+# Median blur (the filter this app has always used, with a kernel size of 15)
+class MedianFilter(PreFilter):
+
+    def __init__(self, size=15):
+        PreFilter.__init__(self)
+        self.size = size
+        self.name = "median " + str(size)
+
+    def blur(self, image_BGR, scale):
+        return cv2.medianBlur(image_BGR, scaled_size(self.size, scale))
+
+# Box blur (averages every pixel in the kernel, much cheaper than a median blur)
+class BoxFilter(PreFilter):
+
+    def __init__(self, size=15):
+        PreFilter.__init__(self)
+        self.size = size
+        self.name = "box " + str(size)
+
+    def blur(self, image_BGR, scale):
+        size = scaled_size(self.size, scale)
+        return cv2.blur(image_BGR, (size, size))
+
+# Gaussian blur (weights pixels nearer the centre of the kernel more)
+class GaussianFilter(PreFilter):
+
+    def __init__(self, size=15):
+        PreFilter.__init__(self)
+        self.size = size
+        self.name = "gaussian " + str(size)
+
+    def blur(self, image_BGR, scale):
+        size = scaled_size(self.size, scale)
+        return cv2.GaussianBlur(image_BGR, (size, size), 0)
+
+# Median blur done on a smaller copy of the image which is then scaled back up
+class DownscaledMedianFilter(PreFilter):
+
+    # factor is how much the image is shrunk by before blurring
+    def __init__(self, size=15, factor=0.5):
+        PreFilter.__init__(self)
+        self.size = size
+        self.factor = factor
+        self.name = "downscaled median " + str(size) + " x" + str(factor)
+
+    def blur(self, image_BGR, scale):
+        height, width = image_BGR.shape[:2]
+        small = cv2.resize(image_BGR, None, fx=self.factor, fy=self.factor, interpolation=cv2.INTER_AREA)
+        # Kernel is shrunk by the same amount so it covers the same area of the image
+        small = cv2.medianBlur(small, scaled_size(self.size, scale * self.factor))
+        return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+# Morphological opening or closing applied to each colour's mask instead of blurring the image
+# Opening removes small specks of noise, closing fills small holes in the colours
+class MaskMorphologyFilter(PreFilter):
+
+    def __init__(self, operation="open", size=5):
+        PreFilter.__init__(self)
+        self.operation = operation
+        self.size = size
+        self.name = operation + " " + str(size)
+
+    def filters_masks(self):
+        return True
+
+    def clean_mask(self, mask, scale):
+        size = scaled_size(self.size, scale)
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+        if self.operation == "close":
+            return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+# Function that creates a filter from its name, e.g. create_prefilter("gaussian", 9)
+def create_prefilter(name, size=15):
+    if name == "median":
+        return MedianFilter(size)
+    elif name == "box":
+        return BoxFilter(size)
+    elif name == "gaussian":
+        return GaussianFilter(size)
+    elif name == "downscaled":
+        return DownscaledMedianFilter(size)
+    elif name == "open" or name == "close":
+        return MaskMorphologyFilter(name, size)
+    elif name == "none":
+        return PreFilter()
+    raise ValueError("Unknown filter: " + str(name))
+
+# Function that runs every filter over the same frames and returns the average cost (in ms per frame) of each one
+def measure_costs(filters, frames, scale=1.0):
+    costs = {}
+    for prefilter in filters:
+        prefilter.costs.clear()
+        for frame in frames:
+            prefilter.filter_image(frame, scale)
+            if prefilter.filters_masks():
+                # A mask of the same size as the frame is used to time the mask filters
+                mask = cv2.inRange(frame, (128, 0, 0), (255, 255, 255))
+                prefilter.filter_mask(mask, scale)
+        costs[prefilter.name] = prefilter.cost_per_frame()
+    return costs
+
+# Compares every filter on a recording when this file is run, e.g. "python prefilters.py session.npz"
+if __name__ == "__main__":
+    import sys
+    from frame_sources import RecordingSource
+
+    source = RecordingSource(sys.argv[1])
+    frames = []
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    source.release()
+
+    filters = [MedianFilter(15), BoxFilter(15), GaussianFilter(15), DownscaledMedianFilter(15), MaskMorphologyFilter("open", 5), MaskMorphologyFilter("close", 5), PreFilter()]
+    for name, cost in sorted(measure_costs(filters, frames).items(), key=lambda item: item[1]):
+        print(name + ": " + str(round(cost, 2)) + " ms per frame")
@@ -0,0 +1,60 @@
+# Module used to mask and convert the camera frames
+import cv2
+# Used to limit how often the preview is updated
+import time
+# Modules used to show the frames in a tkinter label
+from PIL import Image, ImageTk
+
+# Class that shows camera frames in a tkinter label
+# One PhotoImage is reused for every frame (instead of making a new one each time) and it can be updated less often
+# than frames are processed, or turned off completely
+class PreviewRenderer:
+
+    # max_fps is the most times per second the preview is updated (None for every frame)
+    def __init__(self, label, max_fps=None, enabled=True):
+        self.label = label
+        self.max_fps = max_fps
+        self.enabled = enabled
+
+        # The PhotoImage shown in the label, made when the first frame is shown
+        self.photo = None
+        # Time the preview was last updated
+        self.last_render = None
+
+        # Number of frames shown and number skipped to keep to max_fps
+        self.frames_rendered = 0
+        self.frames_skipped = 0
+
+    # Function that returns True if the preview should be updated now
+    # Checked before doing any work for the preview so skipped frames cost nothing
+    def due(self):
+        if not self.enabled:
+            return False
+        if self.max_fps is None or self.last_render is None:
+            return True
+        if time.perf_counter() - self.last_render >= 1 / self.max_fps:
+            return True
+        self.frames_skipped += 1
+        return False
+
+    # Function that shows a BGR image in the label, with only the parts in the mask shown if a mask is given
+    def render(self, image_BGR, mask=None):
+        if mask is not None:
+            # Overlays the mask on the BGR image
+            image_BGR = cv2.bitwise_and(image_BGR, image_BGR, mask=mask)
+        # Converts from BGR to RGB otherwise image is in wrong colour space (e.g. red colours will look blue)
+        cv2image = cv2.cvtColor(image_BGR, cv2.COLOR_BGR2RGB)
+        img = Image.fromarray(cv2image)
+
+        # A new PhotoImage is only needed for the first frame or if the size of the frames changes
+        if self.photo is None or self.photo.width() != img.width or self.photo.height() != img.height:
+            self.photo = ImageTk.PhotoImage(image=img)
+            # Reference kept on the label so the image is not removed by the garbage collector
+            self.label.imgtk = self.photo
+            self.label.configure(image=self.photo)
+        else:
+            # Copies the new frame into the existing PhotoImage, which the label is already showing
+            self.photo.paste(img)
+
+        self.last_render = time.perf_counter()
+        self.frames_rendered += 1
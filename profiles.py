@@ -0,0 +1,48 @@
+# Used to save the calibrated colours and keys in a readable file
+import json
+# Used to find and create the profile files
+import os
+# Imports numpy for the colour ranges
+import numpy as np
+# Lookup table compiled from each profile's colour ranges
+from segmentation import HSVLookupTable
+# Function used to save keys as text
+from key_output import key_to_text
+
+# Folder the profiles are saved in, in the user's config folder so they are kept out of the program's own folder
+PROFILE_DIR = os.path.join(os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config"), "steering_wheel_app", "profiles")
+
+# Function that returns the path of a profile's file
+def profile_path(name, directory=PROFILE_DIR):
+    return os.path.join(directory, name + ".json")
+
+# Function that returns the names of all saved profiles
+def list_profiles(directory=PROFILE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(file_name[:-len(".json")] for file_name in os.listdir(directory) if file_name.endswith(".json"))
+
+# Function that saves a profile: the 4 colour ranges and the keys
+# colour_ranges = [dir1_HSV, dir2_HSV, brake_HSV, acc_HSV]
+def save_profile(name, colour_ranges, keys, directory=PROFILE_DIR):
+    os.makedirs(directory, exist_ok=True)
+
+    profile = {
+        "colour_ranges": [[np.asarray(lower).tolist(), np.asarray(upper).tolist()] for lower, upper in colour_ranges],
+        "keys": [key_to_text(key) for key in keys],
+    }
+    with open(profile_path(name, directory), "w") as file:
+        json.dump(profile, file, indent=4)
+
+# Function that loads a profile saved with save_profile
+# Returns a dictionary with the "colour_ranges", "keys" and "lookup_table" (compiled from the colour ranges, which takes microseconds)
+# Keys are left as text (e.g. "Key.up") so profiles can be read without pynput, the keyboard output turns them into keys
+def load_profile(name, directory=PROFILE_DIR):
+    with open(profile_path(name, directory)) as file:
+        profile = json.load(file)
+    colour_ranges = [[np.array(lower), np.array(upper)] for lower, upper in profile["colour_ranges"]]
+    return {
+        "colour_ranges": colour_ranges,
+        "keys": list(profile["keys"]),
+        "lookup_table": HSVLookupTable(colour_ranges),
+    }
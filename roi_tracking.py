@@ -0,0 +1,77 @@
+# Class that remembers where each colour marker was last seen so only the area around the wheel needs searching
+class ROITracker:
+
+    # padding is how many radii are added around each marker, min_padding is the smallest padding in pixels
+    # full_search_interval is how many frames can pass before the whole frame is searched again anyway
+    def __init__(self, colour_count=4, padding=1.5, min_padding=20, full_search_interval=30):
+        self.colour_count = colour_count
+        self.padding = padding
+        self.min_padding = min_padding
+        self.full_search_interval = full_search_interval
+
+        # Last known centre (x, y) and radius of each marker, None if the marker is lost
+        self.centres = [None] * colour_count
+        self.radii = [None] * colour_count
+
+        # Number of frames searched since the last full frame search
+        self.frames_since_full_search = 0
+
+    # Function that stores where a marker was found in the latest frame
+    def update(self, colour_index, centre, radius):
+        self.centres[colour_index] = centre
+        self.radii[colour_index] = radius
+
+    # Function called when a marker could not be found in the latest frame
+    def lose(self, colour_index):
+        self.centres[colour_index] = None
+        self.radii[colour_index] = None
+
+    # Function that forgets every marker so the next frame is searched in full
+    def reset(self):
+        for i in range(self.colour_count):
+            self.lose(i)
+
+    # Function that returns the window (x0, y0, x1, y1) to search in a frame of the given shape
+    # Returns None when the whole frame should be searched
+    def search_window(self, frame_shape):
+        height, width = frame_shape[:2]
+        tracked = [i for i in range(self.colour_count) if self.centres[i] is not None]
+
+        # The whole frame is searched if the wheel has not been found or it is time for a periodic full search
+        if len(tracked) < 2 or self.frames_since_full_search >= self.full_search_interval:
+            self.frames_since_full_search = 0
+            return None
+        self.frames_since_full_search += 1
+
+        # Union of the padded windows around every marker that is being tracked
+        x0, y0, x1, y1 = width, height, 0, 0
+        largest_radius = 0
+        for i in tracked:
+            centre_x, centre_y = self.centres[i]
+            radius = self.radii[i]
+            pad = max(radius * (1 + self.padding), self.min_padding)
+            x0 = min(x0, centre_x - pad)
+            y0 = min(y0, centre_y - pad)
+            x1 = max(x1, centre_x + pad)
+            y1 = max(y1, centre_y + pad)
+            largest_radius = max(largest_radius, radius)
+
+        # Markers that are lost (e.g. brake and acceleration colours being hidden) will reappear somewhere on the wheel,
+        # so the window is grown by about the size of the wheel to find them as soon as they are shown again
+        if len(tracked) < self.colour_count:
+            grow = 2 * largest_radius
+            x0 -= grow
+            y0 -= grow
+            x1 += grow
+            y1 += grow
+
+        # Window must be inside the frame
+        x0 = max(0, int(x0))
+        y0 = max(0, int(y0))
+        x1 = min(width, int(x1) + 1)
+        y1 = min(height, int(y1) + 1)
+
+        # Searching most of the frame anyway is no faster than a full search
+        if (x1 - x0) * (y1 - y0) > 0.5 * width * height:
+            return None
+        return x0, y0, x1, y1
@@ -0,0 +1,72 @@
+# Module used for the OpenCV inRange function
+import cv2
+# Imports numpy for the lookup table
+import numpy as np
+
+# Number of possible hues in an OpenCV HSV image (hue only goes up to 179)
+HUE_VALUES = 180
+
+# Function that returns the hue ranges covered by a lower and upper hue
+# If the lower hue is bigger than the upper hue then the range wraps past 179 back to 0 (needed for red colours)
+def hue_spans(lower_hue, upper_hue):
+    lower_hue = int(lower_hue)
+    upper_hue = int(upper_hue)
+    if lower_hue <= upper_hue:
+        return [(lower_hue, upper_hue)]
+    return [(lower_hue, HUE_VALUES - 1), (0, upper_hue)]
+
+# Function that works like cv2.inRange for a single colour but also supports hue ranges that wrap past 179
+def in_hsv_range(image_HSV, lower_bound, upper_bound):
+    spans = hue_spans(lower_bound[0], upper_bound[0])
+    mask = None
+    for lower_hue, upper_hue in spans:
+        lower = np.array([lower_hue, lower_bound[1], lower_bound[2]])
+        upper = np.array([upper_hue, upper_bound[1], upper_bound[2]])
+        span_mask = cv2.inRange(image_HSV, lower, upper)
+        # Combines the two halves of a wrapped hue range
+        mask = span_mask if mask is None else cv2.bitwise_or(mask, span_mask)
+    return mask
+
+# Class that stores a precomputed table giving the colour(s) of every possible HSV value
+# Every colour range is a box of hue, saturation and value (a wrapped hue range is still one range of hue), so a pixel is
+# inside a colour's range exactly when each of its channels is. The table therefore has one 256 entry row per channel,
+# and a pixel's colours are the colours of its hue AND its saturation AND its value
+class HSVLookupTable:
+
+    def __init__(self, colour_ranges):
+        # colour_ranges = [dir1_HSV, dir2_HSV, brake_HSV, acc_HSV] where ..._HSV = [lower bound, upper bound]
+        self.colour_ranges = [(np.array(lower, dtype=np.int64), np.array(upper, dtype=np.int64)) for lower, upper in colour_ranges]
+
+        # Each entry is a set of bit flags, bit i being set if that channel value is inside colour i's range
+        # Bit flags are used (instead of one label per pixel) so overlapping ranges behave like the separate inRange masks did
+        # Shaped (1, 256, 3) so cv2.LUT looks up each channel of an HSV image in its own row
+        self.table = np.zeros((1, 256, 3), dtype=np.uint8)
+        for i, (lower, upper) in enumerate(self.colour_ranges):
+            bit = 1 << i
+            for lower_hue, upper_hue in hue_spans(lower[0], upper[0]):
+                self.table[0, lower_hue:upper_hue + 1, 0] |= bit
+            self.table[0, lower[1]:upper[1] + 1, 1] |= bit
+            self.table[0, lower[2]:upper[2] + 1, 2] |= bit
+
+    # Function that checks if this table was compiled from the given colour ranges
+    def matches(self, colour_ranges):
+        if len(colour_ranges) != len(self.colour_ranges):
+            return False
+        for (lower, upper), (table_lower, table_upper) in zip(colour_ranges, self.colour_ranges):
+            if not (np.array_equal(lower, table_lower) and np.array_equal(upper, table_upper)):
+                return False
+        return True
+
+    # Function that labels every pixel of an HSV image with one lookup of each channel
+    def label(self, image_HSV):
+        # Bit flags of each pixel's hue, saturation and value
+        channel_flags = cv2.LUT(image_HSV, self.table)
+        hue_flags, saturation_flags, value_flags = cv2.split(channel_flags)
+        # Image of bit flags with the same height and width as the HSV image
+        labels = cv2.bitwise_and(hue_flags, saturation_flags)
+        return cv2.bitwise_and(labels, value_flags, dst=labels)
+
+    # Function that returns the mask of one colour (non-zero where the colour is) from a labelled image
+    # Each colour is one bit of the labelled image, so this is a new array (one pass over the labelled image), not a view
+    def mask(self, labels, colour_index):
+        return cv2.bitwise_and(labels, 1 << colour_index)
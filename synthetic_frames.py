@@ -0,0 +1,92 @@
+# Draws frames of the four-colour steering wheel so the image processing can be tested and timed without a camera
+import cv2
+# Used to timestamp frames like a camera would
+import time
+# Imports numpy for the frames and the noise
+import numpy as np
+
+# Colour (in OpenCV HSV) of each quadrant of the synthetic wheel, in the order dir1, dir2, brake, acc
+WHEEL_COLOURS_HSV = [
+    (0, 220, 200),   # Red (its hue range wraps past 179)
+    (110, 220, 200), # Blue
+    (28, 220, 220),  # Yellow
+    (60, 220, 180),  # Green
+]
+
+# Colour ranges that find the synthetic wheel's colours, in the same form as the calibrated ranges
+SYNTHETIC_RANGES = [
+    [np.array([170, 120, 100]), np.array([10, 255, 255])],
+    [np.array([100, 120, 100]), np.array([120, 255, 255])],
+    [np.array([20, 120, 100]), np.array([36, 255, 255])],
+    [np.array([50, 120, 100]), np.array([70, 255, 255])],
+]
+
+# Angle (in OpenCV's ellipse angles, clockwise from the right) each quadrant starts at when the wheel is straight
+# The direction colours are at the top and bottom, and the brake and acceleration colours at the sides
+QUADRANT_STARTS = [225, 45, 135, 315]
+
+# Function that converts an HSV colour to the BGR colour OpenCV draws with
+def hsv_to_bgr(colour_HSV):
+    pixel = np.uint8([[colour_HSV]])
+    return tuple(int(value) for value in cv2.cvtColor(pixel, cv2.COLOR_HSV2BGR)[0, 0])
+
+# Function that draws one frame of the wheel as the camera would see it (the image processing mirrors it)
+# angle is how far (in degrees) the wheel is turned, positive being to the right once mirrored
+# noise is the standard deviation of the random noise added to every pixel (0 for none)
+# hidden is a list of colour indexes to leave off the wheel (e.g. [2] to not be braking)
+def make_wheel_frame(width=640, height=480, angle=0.0, noise=0.0, hidden=(), radius=None, centre=None, seed=0):
+    # Grey background with a gradient so it is not a single colour
+    background = np.linspace(60, 120, width, dtype=np.uint8)
+    frame = np.repeat(np.repeat(background[np.newaxis, :, np.newaxis], height, axis=0), 3, axis=2)
+
+    if radius is None:
+        radius = min(width, height) // 4
+    if centre is None:
+        centre = (width // 2, height // 2)
+    for colour_index, start in enumerate(QUADRANT_STARTS):
+        if colour_index in hidden:
+            continue
+        # Turned anticlockwise in the camera's view, which is clockwise once mirrored
+        start_angle = start - angle
+        cv2.ellipse(frame, centre, (radius, radius), 0, start_angle, start_angle + 90, hsv_to_bgr(WHEEL_COLOURS_HSV[colour_index]), -1)
+
+    if noise > 0:
+        random_generator = np.random.default_rng(seed)
+        noisy = frame.astype(np.float32) + random_generator.normal(0, noise, frame.shape).astype(np.float32)
+        frame = np.clip(noisy, 0, 255).astype(np.uint8)
+    return frame
+
+# Class that gives synthetic frames like a camera, so it can be used as the source of an ImageProcessing object
+# The wheel is turned from -max_angle to max_angle and back over frame_count frames, and the frames are repeated forever
+class SyntheticSource:
+
+    def __init__(self, width=640, height=480, max_angle=45.0, noise=0.0, frame_count=60):
+        angles = max_angle * np.sin(np.linspace(0, 2 * np.pi, frame_count, endpoint=False))
+        # Frames are drawn once up front so drawing them is not timed along with the image processing
+        self.frames = [make_wheel_frame(width, height, angle, noise, seed=i) for i, angle in enumerate(angles)]
+        self.angles = angles
+        self.position = 0
+        self.timestamp = None
+        # Always has another frame, like a camera
+        self.running = True
+
+    def read(self):
+        frame = self.frames[self.position % len(self.frames)]
+        self.position += 1
+        self.timestamp = time.perf_counter()
+        return True, frame
+
+    def release(self):
+        pass
+
+# Saves a few synthetic frames when this file is run so they can be looked at, e.g. "python synthetic_frames.py 1280 720 10"
+if __name__ == "__main__":
+    import sys
+
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 640
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 480
+    noise = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    for angle in [-45, 0, 45]:
+        path = "synthetic_" + str(angle) + ".png"
+        cv2.imwrite(path, make_wheel_frame(width, height, angle, noise))
+        print("Saved " + path)
@@ -0,0 +1,76 @@
+# Tests for sharing and keeping cameras warm, using a fake capture instead of a real camera
+import threading
+import pytest
+import camera_manager
+from camera_manager import CameraManager
+
+# Used in place of a ThreadedCapture, counting how many times cameras are opened
+class FakeCapture:
+
+    opened = 0
+
+    def __init__(self, source):
+        FakeCapture.opened += 1
+        self.source = source
+        self.running = True
+        self.frames_captured = 0
+        self.frame_timestamp = None
+        self.frame = None
+        self.condition = threading.Condition()
+
+    def release(self):
+        self.running = False
+
+@pytest.fixture(autouse=True)
+def fake_camera(monkeypatch):
+    FakeCapture.opened = 0
+    monkeypatch.setattr(camera_manager, "ThreadedCapture", FakeCapture)
+    monkeypatch.setattr(camera_manager, "CameraSource", lambda index, settings: (index, settings))
+
+def test_camera_is_shared_and_counted():
+    manager = CameraManager(keep_warm=None)
+    first = manager.acquire(0)
+    second = manager.acquire(0)
+    assert FakeCapture.opened == 1
+    assert manager.users[0] == 2
+    first.release()
+    # Releasing the same handle twice only counts once
+    first.release()
+    assert manager.users[0] == 1
+    second.release()
+    assert manager.users[0] == 0
+    manager.close_all()
+
+def test_released_camera_is_kept_warm():
+    manager = CameraManager(keep_warm=60.0)
+    handle = manager.acquire(0)
+    handle.release()
+    # Still open, waiting to be closed
+    assert handle.capture.running
+    assert 0 in manager.timers
+    # Acquiring it again uses the open camera and stops it being closed
+    again = manager.acquire(0)
+    assert again.capture is handle.capture
+    assert FakeCapture.opened == 1
+    assert 0 not in manager.timers
+    again.release()
+    manager.close_all()
+
+def test_close_idle_only_closes_unused_cameras():
+    manager = CameraManager(keep_warm=60.0)
+    idle = manager.acquire(0)
+    busy = manager.acquire(1)
+    idle.release()
+    manager.close_idle()
+    assert not idle.capture.running
+    assert busy.capture.running
+    busy.release()
+    manager.close_all()
+
+def test_keep_warm_timer_closes_the_camera():
+    manager = CameraManager(keep_warm=0.01)
+    handle = manager.acquire(0)
+    handle.release()
+    manager.timers[0].join(1.0)
+    assert not handle.capture.running
+    assert 0 not in manager.captures
@@ -0,0 +1,26 @@
+# Tests for working out a colour's HSV range from sampled pixels
+import numpy as np
+from colour_sampling import estimate_hsv_range
+
+# Pixels with every hue in hues, a saturation of 200 and a value of 150
+def pixels(hues):
+    return np.array([[hue, 200, 150] for hue in hues], dtype=np.uint8)
+
+def test_range_contains_the_pixels():
+    lower, upper = estimate_hsv_range(pixels(range(100, 111)))
+    assert lower.tolist() == [95, 170, 120]
+    assert upper.tolist() == [115, 230, 180]
+
+def test_red_hue_wraps_past_179():
+    # Red pixels either side of 0 are next to each other, so the range is small and wraps instead of covering every hue
+    lower, upper = estimate_hsv_range(pixels([176, 177, 178, 179, 0, 1, 2, 3]))
+    assert lower[0] == 171
+    assert upper[0] == 8
+
+def test_spread_out_hues_keep_every_hue():
+    # Hues all round the circle, which with the margin cover more than every hue
+    lower, upper = estimate_hsv_range(pixels(range(0, 180, 10)), margin=(20, 30, 30))
+    assert (lower[0], upper[0]) == (0, 179)
+
+def test_no_pixels():
+    assert estimate_hsv_range(np.zeros((0, 3), dtype=np.uint8)) is None
@@ -0,0 +1,76 @@
+# Tests for the hysteresis and minimum hold times of DecisionFilter, using made-up measurements instead of camera frames
+import pytest
+
+# decision_filter gets the colour indexes from frame_analysis, which needs OpenCV, numpy and imutils
+pytest.importorskip("cv2")
+pytest.importorskip("numpy")
+pytest.importorskip("imutils")
+
+from decision_filter import DecisionFilter, HeldState, DIR1, DIR2, BRAKE, ACC
+
+# Used in place of a FrameAnalysis: radii is the radius of each colour (None if it is not in the frame)
+# and offset is how far left of the bottom direction marker the top one is (positive is steering left)
+class FakeAnalysis:
+
+    def __init__(self, timestamp, radii, offset=0.0, radius_threshold=10.0, direction_threshold=20.0):
+        self.timestamp = timestamp
+        self.radius_threshold = radius_threshold
+        self.direction_threshold = direction_threshold
+        centres = {DIR1: (100.0 - offset, 50.0), DIR2: (100.0, 150.0), BRAKE: (150.0, 100.0), ACC: (50.0, 100.0)}
+        self.measurements = {index: None if radius is None else (radius, centres[index]) for index, radius in radii.items()}
+        # Decisions made from this frame on its own, like FrameAnalysis makes them
+        self.braking = self.past_threshold(BRAKE)
+        self.accelerating = self.past_threshold(ACC)
+        if not (self.past_threshold(DIR1) and self.past_threshold(DIR2)):
+            self.direction = "Contour(s) missing"
+        elif offset > direction_threshold:
+            self.direction = "LEFT"
+        elif -offset > direction_threshold:
+            self.direction = "RIGHT"
+        else:
+            self.direction = "STRAIGHT"
+
+    def measure(self, colour_index):
+        return self.measurements[colour_index]
+
+    def past_threshold(self, colour_index):
+        measurement = self.measurements[colour_index]
+        return measurement is not None and measurement[0] > self.radius_threshold
+
+# Frame with both direction markers shown, and the brake marker at brake_radius
+def frame(timestamp, brake_radius=None, offset=0.0):
+    return FakeAnalysis(timestamp, {DIR1: 20.0, DIR2: 20.0, BRAKE: brake_radius, ACC: None}, offset)
+
+# Settings with no minimum hold times, so only the hysteresis is tested
+NO_HOLD = {"min_hold": {"direction": 0.0, "braking": 0.0, "accelerating": 0.0}}
+
+def test_held_state_keeps_a_change_for_min_hold():
+    state = HeldState(False, 0.05)
+    # First change is never held back
+    assert state.update(True, 0.0) is True
+    assert state.update(False, 0.01) is True
+    assert state.update(False, 0.06) is False
+    assert state.transitions == 2
+
+def test_braking_hysteresis():
+    decision_filter = DecisionFilter(NO_HOLD)
+    # Threshold 10 with a band of 0.2: turns on above 12 and only off again below 8
+    radii = [11, 13, 11, 9, 7, 11, 13]
+    braking = [decision_filter.update(frame(i * 0.03, radius))[1] for i, radius in enumerate(radii)]
+    assert braking == [False, True, True, True, False, False, True]
+
+def test_direction_hysteresis():
+    decision_filter = DecisionFilter(NO_HOLD)
+    # Threshold 20 with a band of 0.25: starts turning above 25 and keeps turning above 15
+    offsets = [0, 22, 26, 18, 14, -26, -18, -14]
+    directions = [decision_filter.update(frame(i * 0.03, offset=offset))[0] for i, offset in enumerate(offsets)]
+    assert directions == ["STRAIGHT", "STRAIGHT", "LEFT", "LEFT", "STRAIGHT", "RIGHT", "RIGHT", "STRAIGHT"]
+
+def test_flicker_is_suppressed_and_counted():
+    decision_filter = DecisionFilter()
+    # Marker flickering either side of the threshold every frame, which the frames on their own would follow
+    radii = [13, 7, 13, 7, 13, 7]
+    braking = [decision_filter.update(frame(i * 0.01, radius))[1] for i, radius in enumerate(radii)]
+    # Each change is held for at least 50 ms
+    assert braking == [True, True, True, True, True, False]
+    assert decision_filter.suppressed_transitions > 0
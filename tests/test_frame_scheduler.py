@@ -0,0 +1,99 @@
+# Tests for the frame pacing, using a fake clock instead of waiting in real time
+import pytest
+import frame_scheduler
+from frame_scheduler import FramePacer, FixedRateScheduler
+from latency import LatencyStats
+
+# Clock that only moves when told to
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(frame_scheduler.time, "perf_counter", fake_clock)
+    return fake_clock
+
+# Runs one frame through a pacer: captured at "captured", taking "cost" seconds to process, returns the delay it asks for
+def run_frame(pacer, clock, captured, cost):
+    pacer.begin()
+    clock.advance(cost)
+    return pacer.end(captured)
+
+def test_waits_for_the_next_camera_frame(clock):
+    pacer = FramePacer()
+    for i in range(200):
+        # Camera gives a frame every 1/30 s whatever the loop does
+        captured = 100.0 + i / 30
+        clock.now = max(clock.now, captured)
+        delay = run_frame(pacer, clock, captured, 0.01)
+        # Timers fire a little late, which must not make the interval look longer
+        clock.advance(delay + 0.002)
+    assert pacer.frame_interval == pytest.approx(1 / 30, abs=1e-3)
+    # Next frame is expected one interval after the last one was captured (this one started 2 ms late and took 10 ms)
+    assert delay == pytest.approx(1 / 30 - 0.012, abs=1e-3)
+
+def test_no_new_frame_checks_again_soon(clock):
+    pacer = FramePacer(target_fps=20)
+    assert run_frame(pacer, clock, None, 0.0) == pytest.approx(0.05 / 4)
+
+def test_target_rate_is_never_exceeded(clock):
+    pacer = FramePacer(target_fps=10)
+    for _ in range(5):
+        delay = run_frame(pacer, clock, clock.now, 0.01)
+        clock.advance(delay)
+    assert delay == pytest.approx(0.09)
+
+def test_missed_deadlines_are_counted(clock):
+    stats = LatencyStats()
+    pacer = FramePacer(target_fps=30, stats=stats)
+    run_frame(pacer, clock, clock.now, 0.01)
+    run_frame(pacer, clock, clock.now, 0.05)
+    assert pacer.missed_deadlines == 1
+    assert stats.missed_deadlines == 1
+
+def test_recordings_replayed_fast_are_not_held_back(clock):
+    pacer = FramePacer()
+    run_frame(pacer, clock, clock.now, 0.001)
+    # Frame "captured" in the future
+    assert run_frame(pacer, clock, clock.now + 1.0, 0.001) == 0.0
+
+# Widget that records the calls scheduled with "after" instead of running a tkinter main loop
+class FakeWidget:
+
+    def __init__(self):
+        self.scheduled = None
+
+    def after(self, milliseconds, function):
+        self.scheduled = (milliseconds, function)
+        return "after#1"
+
+    def after_cancel(self, after_id):
+        self.scheduled = None
+
+def test_fixed_rate_does_not_drift(clock):
+    widget = FakeWidget()
+    calls = []
+    # Each call takes 5 ms, like rendering a preview frame
+    def callback():
+        calls.append(clock.now)
+        clock.advance(0.005)
+    scheduler = FixedRateScheduler(widget, callback, fps=15)
+    scheduler.start()
+    for _ in range(300):
+        milliseconds, function = widget.scheduled
+        # Timers fire a little late
+        clock.advance(milliseconds / 1000 + 0.003)
+        function()
+    average_period = (calls[-1] - calls[0]) / (len(calls) - 1)
+    assert average_period == pytest.approx(1 / 15, abs=0.002)
+    scheduler.stop()
+    assert widget.scheduled is None
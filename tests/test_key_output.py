@@ -0,0 +1,78 @@
+# Tests for the transition-only OutputDispatcher, using the loopback backend instead of a real keyboard or gamepad
+import pytest
+from key_output import OutputDispatcher, LoopbackBackend, create_backend, key_to_text, text_to_key
+
+# Control names and values the backend received, in order
+def sent(backend):
+    return [(name, value) for _, name, value in backend.events]
+
+def test_only_changes_are_sent():
+    backend = LoopbackBackend()
+    dispatcher = OutputDispatcher(backend)
+    dispatcher.update("STRAIGHT", False, True)
+    # Same state again, nothing should be sent
+    dispatcher.update("STRAIGHT", False, True)
+    dispatcher.update("LEFT", True, True)
+    dispatcher.update("RIGHT", False, True)
+    dispatcher.close()
+    assert sent(backend) == [
+        ("accelerate", True),
+        ("left", True),
+        ("brake", True),
+        ("left", False),
+        ("brake", False),
+        ("right", True),
+        # Closing releases whatever is still held
+        ("accelerate", False),
+        ("right", False),
+    ]
+
+def test_steering_changes_are_sent_to_analog_backends():
+    backend = LoopbackBackend()
+    dispatcher = OutputDispatcher(backend)
+    dispatcher.update("LEFT", False, False, steering=-0.5)
+    dispatcher.update("LEFT", False, False, steering=-0.5)
+    dispatcher.update("STRAIGHT", False, False, steering=0.0)
+    dispatcher.close()
+    assert [(name, value) for name, value in sent(backend) if name == "steering"] == [("steering", -0.5), ("steering", 0.0)]
+
+def test_only_analog_backends_want_steering():
+    dispatcher = OutputDispatcher(LoopbackBackend())
+    assert dispatcher.wants_steering
+    dispatcher.close()
+    # Backend with no steering axis, like the keyboard
+    backend = LoopbackBackend()
+    backend.analog_steering = False
+    dispatcher = OutputDispatcher(backend)
+    assert not dispatcher.wants_steering
+    dispatcher.update("LEFT", False, False, steering=-0.5)
+    dispatcher.close()
+    assert "steering" not in [name for name, _ in sent(backend)]
+
+def test_close_releases_everything_once():
+    backend = LoopbackBackend()
+    dispatcher = OutputDispatcher(backend)
+    dispatcher.update("RIGHT", True, False)
+    dispatcher.close()
+    assert dispatcher.held == []
+    events = len(backend.events)
+    # Closing again does nothing
+    dispatcher.close()
+    dispatcher.update("LEFT", False, True)
+    assert len(backend.events) == events
+
+def test_frame_timestamps_are_kept_for_latency():
+    backend = LoopbackBackend()
+    dispatcher = OutputDispatcher(backend)
+    dispatcher.update("LEFT", False, False, frame_timestamp=0.0)
+    dispatcher.close()
+    # Release from closing has no frame, so only the press is counted
+    assert len(dispatcher.latencies()) == 1
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend("joystick", [])
+
+def test_text_keys_are_left_as_text():
+    assert text_to_key("w") == "w"
+    assert key_to_text("w") == "w"
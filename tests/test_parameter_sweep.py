@@ -0,0 +1,29 @@
+# Tests for widening and narrowing colour ranges in the parameter sweep
+from parameter_sweep import adjust_range, parameter_grid
+
+def test_widens_saturation_and_value():
+    lower, upper = adjust_range([100, 120, 100], [120, 240, 200], sv_margin=20)
+    assert lower.tolist() == [100, 100, 80]
+    # Clipped to 255
+    assert upper.tolist() == [120, 255, 220]
+
+def test_hue_wraps_past_179():
+    lower, upper = adjust_range([2, 100, 100], [20, 255, 255], hue_margin=5)
+    assert (lower[0], upper[0]) == (177, 25)
+    # Already wrapped ranges keep wrapping
+    lower, upper = adjust_range([170, 100, 100], [10, 255, 255], hue_margin=5)
+    assert (lower[0], upper[0]) == (165, 15)
+
+def test_hue_wider_than_every_hue_covers_every_hue():
+    lower, upper = adjust_range([170, 100, 100], [10, 255, 255], hue_margin=85)
+    assert (lower[0], upper[0]) == (0, 179)
+
+def test_narrowing_past_nothing_keeps_the_middle():
+    lower, upper = adjust_range([100, 120, 100], [120, 140, 200], sv_margin=-20)
+    assert lower.tolist() == [100, 130, 120]
+    assert upper.tolist() == [120, 130, 180]
+
+def test_grid_has_every_combination():
+    grid = parameter_grid([10, 15], [40], [5, 15], [0], [0, 5])
+    assert len(grid) == 8
+    assert {"radius_threshold": 10, "direction_threshold": 40, "blur_size": 5, "hsv_margin": 0, "hue_margin": 0} in grid
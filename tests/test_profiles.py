@@ -0,0 +1,24 @@
+# Tests for saving and loading profiles, using a temporary folder instead of the user's profiles
+import numpy as np
+from profiles import save_profile, load_profile, list_profiles
+from segmentation import HSVLookupTable
+
+COLOUR_RANGES = [[np.array([170, 100, 100]), np.array([10, 255, 255])],
+                 [np.array([50, 80, 80]), np.array([70, 255, 255])],
+                 [np.array([100, 80, 80]), np.array([130, 255, 255])],
+                 [np.array([20, 80, 80]), np.array([35, 255, 255])]]
+
+def test_profile_round_trip(tmp_path):
+    save_profile("alice", COLOUR_RANGES, ["w", "a", "s", "Key.right"], directory=str(tmp_path))
+    assert list_profiles(str(tmp_path)) == ["alice"]
+    profile = load_profile("alice", directory=str(tmp_path))
+    for (lower, upper), (saved_lower, saved_upper) in zip(COLOUR_RANGES, profile["colour_ranges"]):
+        assert np.array_equal(lower, saved_lower)
+        assert np.array_equal(upper, saved_upper)
+    # Keys stay as text until the keyboard output is created
+    assert profile["keys"] == ["w", "a", "s", "Key.right"]
+    assert isinstance(profile["lookup_table"], HSVLookupTable)
+    assert profile["lookup_table"].matches(COLOUR_RANGES)
+
+def test_no_profiles_saved(tmp_path):
+    assert list_profiles(str(tmp_path / "missing")) == []
@@ -0,0 +1,47 @@
+# Tests for the window ROITracker searches, using made-up marker positions in a 640x480 frame
+from roi_tracking import ROITracker
+
+FRAME_SHAPE = (480, 640)
+
+# Tracker with all 4 markers of a small wheel in the middle of the frame (dir1 top, dir2 bottom, brake left, acc right)
+def tracked_wheel(**kwargs):
+    tracker = ROITracker(**kwargs)
+    for i, centre in enumerate([(320, 200), (320, 280), (280, 240), (360, 240)]):
+        tracker.update(i, centre, 10)
+    return tracker
+
+def test_window_surrounds_the_markers():
+    # Each marker is padded by 2.5 radii (25 pixels)
+    assert tracked_wheel().search_window(FRAME_SHAPE) == (255, 175, 386, 306)
+
+def test_whole_frame_until_two_markers_are_found():
+    tracker = ROITracker()
+    assert tracker.search_window(FRAME_SHAPE) is None
+    tracker.update(0, (320, 200), 10)
+    assert tracker.search_window(FRAME_SHAPE) is None
+    tracker.update(1, (320, 280), 10)
+    assert tracker.search_window(FRAME_SHAPE) is not None
+
+def test_window_grows_when_markers_are_lost():
+    tracker = tracked_wheel()
+    tracker.lose(2)
+    tracker.lose(3)
+    # Direction markers padded by 25 pixels, then grown by 2 radii (20 pixels) to find the hidden markers again
+    assert tracker.search_window(FRAME_SHAPE) == (275, 155, 366, 326)
+
+def test_large_window_searches_the_whole_frame():
+    tracker = ROITracker()
+    tracker.update(0, (320, 100), 100)
+    tracker.update(1, (320, 380), 100)
+    assert tracker.search_window(FRAME_SHAPE) is None
+
+def test_periodic_full_search():
+    tracker = tracked_wheel(full_search_interval=3)
+    windows = [tracker.search_window(FRAME_SHAPE) for _ in range(5)]
+    assert [window is None for window in windows] == [False, False, False, True, False]
+
+def test_reset_forgets_every_marker():
+    tracker = tracked_wheel()
+    tracker.reset()
+    assert tracker.centres == [None] * 4
+    assert tracker.search_window(FRAME_SHAPE) is None
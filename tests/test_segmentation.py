@@ -0,0 +1,43 @@
+# Tests that the lookup table finds exactly the same pixels as inRange, including red hue ranges that wrap past 179
+import cv2
+import numpy as np
+from segmentation import HSVLookupTable, in_hsv_range
+from synthetic_frames import SYNTHETIC_RANGES, make_wheel_frame
+
+# Ranges that overlap each other, so some pixels have more than one colour
+OVERLAPPING_RANGES = [
+    [np.array([170, 50, 50]), np.array([10, 255, 255])],
+    [np.array([0, 100, 0]), np.array([30, 200, 255])],
+    [np.array([25, 0, 100]), np.array([90, 255, 200])],
+    [np.array([90, 60, 60]), np.array([179, 255, 255])],
+]
+
+# Function that checks every colour's labels against in_hsv_range
+def check_labels(image_HSV, colour_ranges):
+    table = HSVLookupTable(colour_ranges)
+    labels = table.label(image_HSV)
+    for i, (lower, upper) in enumerate(colour_ranges):
+        expected = in_hsv_range(image_HSV, lower, upper) > 0
+        assert np.array_equal(table.mask(labels, i) > 0, expected)
+
+def test_random_pixels_match_in_range():
+    rng = np.random.default_rng(0)
+    image_HSV = np.dstack([rng.integers(0, 180, (120, 160)), rng.integers(0, 256, (120, 160)),
+                           rng.integers(0, 256, (120, 160))]).astype(np.uint8)
+    check_labels(image_HSV, OVERLAPPING_RANGES)
+    check_labels(image_HSV, SYNTHETIC_RANGES)
+
+def test_wheel_frame_matches_in_range():
+    image_HSV = cv2.cvtColor(make_wheel_frame(angle=20.0, noise=10.0), cv2.COLOR_BGR2HSV)
+    check_labels(image_HSV, SYNTHETIC_RANGES)
+
+def test_hue_wraps_past_179():
+    table = HSVLookupTable([[np.array([170, 50, 50]), np.array([10, 255, 255])]])
+    # Hues either side of 0 are red, the rest are not
+    image_HSV = np.array([[[175, 200, 200], [5, 200, 200], [0, 200, 200], [90, 200, 200], [169, 200, 200], [11, 200, 200]]], dtype=np.uint8)
+    assert (table.mask(table.label(image_HSV), 0) > 0).tolist() == [[True, True, True, False, False, False]]
+
+def test_table_matches_its_ranges():
+    table = HSVLookupTable(SYNTHETIC_RANGES)
+    assert table.matches(SYNTHETIC_RANGES)
+    assert not table.matches(OVERLAPPING_RANGES)
@@ -0,0 +1,264 @@
+# Module used to run the image processing in its own process
+import multiprocessing
+# Used to share preview frames between processes without copying them through a pipe
+from multiprocessing import shared_memory
+# Used to work out the frame rate of the worker
+import time
+# Used to read the "info" queue without blocking
+import queue
+# Used to keep the worker on one CPU core
+import os
+# Used to stop the worker cleanly (releasing its keys) when it is terminated
+import signal
+import cv2
+import numpy as np
+from frame_sources import open_source
+from camera_manager import acquire_camera, default_manager
+from image_processing import ImageProcessing
+from prefilters import create_prefilter
+from segmentation import HSVLookupTable
+from key_output import OutputDispatcher, create_backend
+from latency import LatencyStats
+from frame_scheduler import FramePacer
+from decision_filter import DecisionFilter
+
+# Directions are stored as numbers in the shared decision array
+DIRECTIONS = ["Contour(s) missing", "LEFT", "RIGHT", "STRAIGHT"]
+
+# Position of each value in the shared decision array
+FRAME_NUMBER = 0
+TIMESTAMP = 1
+DIRECTION = 2
+BRAKING = 3
+ACCELERATING = 4
+FPS = 5
+
+# Settings used if they are not given to the worker
+DEFAULT_SETTINGS = {
+    "source": 0, # Camera index or path to a recording
+    "analysis_scale": 1.0,
+    "roi_tracking": True,
+    "blur_type": "median",
+    "blur_size": 15,
+    "preview_fps": 15,
+    "show_preview": True,
+    "output": "keyboard", # "keyboard", "gamepad" or "loopback" (see key_output.py)
+    "target_fps": None, # Most frames a second to process, None to keep up with the camera
+    "decision_filter": {}, # Hysteresis bands and hold times (see decision_filter.py), None to use each frame's decisions as they are
+    "capture": None, # Webcam resolution, frame rate, pixel format and buffer size (see DEFAULT_CAPTURE_SETTINGS in frame_sources.py)
+    "realtime": True, # Recordings are replayed at the speed they were recorded
+    "loop": False, # Recordings start again from the beginning when they end
+    "cpu": None, # CPU core to keep the worker on (Linux only), None to let the operating system choose
+}
+
+# Function that creates an ImageProcessing object from a dictionary of settings
+# stats is a LatencyStats to record the timings of each stage in, or None
+def create_image_processor(settings, stats=None):
+    source = settings["source"]
+    if isinstance(source, int) or str(source).isdigit():
+        # Waits up to 0.1 seconds for each frame so the worker does not busy-wait between frames
+        source = acquire_camera(int(source), timeout=0.1, settings=settings["capture"])
+        print("Camera mode:", source.mode())
+    else:
+        source = open_source(source, realtime=settings["realtime"], loop=settings["loop"])
+    return ImageProcessing(source=source, analysis_scale=settings["analysis_scale"], roi_tracking=settings["roi_tracking"],
+                           prefilter=create_prefilter(settings["blur_type"], settings["blur_size"]), stats=stats)
+
+# Function run in the worker process: reads frames, finds the gestures, presses the keys and publishes the results
+def run_worker(settings, colour_ranges, keys, stop_event, decision, preview_sequence, preview_enabled, info_queue, stats_queue):
+    # Keeps this worker on its own core, so several workers (e.g. one per wheel) do not slow each other down
+    if settings["cpu"] is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {settings["cpu"]})
+        # OpenCV would otherwise start threads for every core, which would all have to share this one
+        cv2.setNumThreads(1)
+    # Being terminated (e.g. by multiprocessing when the GUI exits) stops the loop like stop() does, so the keys are still released
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: stop_event.set())
+    stats = LatencyStats()
+    image_processor = create_image_processor(settings, stats)
+    image_processor.lookup_table = HSVLookupTable(colour_ranges)
+    output_dispatcher = OutputDispatcher(create_backend(settings["output"], keys), stats=stats)
+    # Waits until the camera should have a new frame (or the target rate allows another one) instead of asking for frames too early
+    pacer = FramePacer(settings["target_fps"], stats)
+    # Stops the outputs from switching on and off when a marker is near a threshold
+    decision_filter = DecisionFilter(settings["decision_filter"], stats) if settings["decision_filter"] is not None else None
+
+    # Shared memory for the preview frame, created once the size of the frames is known
+    preview_memory = None
+    preview_frame = None
+    last_preview = 0.0
+    # Seconds between preview frames, None if previews are never published (preview_fps of 0 or None)
+    preview_interval = 1 / settings["preview_fps"] if settings["preview_fps"] else None
+
+    frame_number = 0
+    # Used to work out the number of frames processed per second
+    fps_start = time.perf_counter()
+    fps_frames = 0
+    fps = 0.0
+
+    try:
+        while not stop_event.is_set():
+            pacer.begin()
+            analysis = image_processor.play_frame(*colour_ranges)
+            if analysis is None:
+                # A camera that is still running just had no new frame yet, anything else has run out of frames
+                if getattr(image_processor.cap, "running", False):
+                    continue
+                break
+
+            # Keys are pressed (or the gamepad moved) here so they do not depend on how responsive the GUI is
+            decision_start = time.perf_counter()
+            if decision_filter is not None:
+                direction, braking, accelerating = decision_filter.update(analysis)
+            else:
+                direction, braking, accelerating = analysis.direction, analysis.braking, analysis.accelerating
+            # Steering is only measured for outputs with a steering axis (e.g. not for the keyboard)
+            steering = analysis.steering if output_dispatcher.wants_steering else 0.0
+            output_dispatcher.update(direction, braking, accelerating, analysis.timestamp, steering)
+            # Measuring the colours happens while the decision is made, so it is taken away from the decision time
+            decision_time = time.perf_counter() - decision_start
+            stats.record("contours", analysis.measure_time * 1000)
+            stats.record("decision", (decision_time - analysis.measure_time) * 1000)
+
+            frame_number += 1
+            fps_frames += 1
+            now = time.perf_counter()
+            if now - fps_start >= 1.0:
+                fps = fps_frames / (now - fps_start)
+                fps_start = now
+                fps_frames = 0
+                # Timings are sent to the GUI once a second
+                stats_queue.put(stats.summary())
+
+            # Publishes the decision for the GUI
+            with decision.get_lock():
+                decision[FRAME_NUMBER] = frame_number
+                decision[TIMESTAMP] = analysis.timestamp if analysis.timestamp is not None else now
+                decision[DIRECTION] = DIRECTIONS.index(direction)
+                decision[BRAKING] = braking
+                decision[ACCELERATING] = accelerating
+                decision[FPS] = fps
+
+            # Publishes a preview frame at most preview_fps times a second, only if the GUI is showing it
+            if preview_interval is not None and preview_enabled.value and now - last_preview >= preview_interval:
+                image_BGR = analysis.image_BGR
+                preview_start = time.perf_counter()
+                if preview_memory is None:
+                    preview_memory = shared_memory.SharedMemory(create=True, size=image_BGR.nbytes)
+                    preview_frame = np.ndarray(image_BGR.shape, dtype=np.uint8, buffer=preview_memory.buf)
+                    # Tells the GUI where to find the preview frames
+                    info_queue.put((preview_memory.name, image_BGR.shape))
+                if image_BGR.shape == preview_frame.shape:
+                    with preview_sequence.get_lock():
+                        # Masked frame written straight into the shared memory
+                        # bitwise_and only writes the pixels inside the mask, so the rest of the last frame is cleared first
+                        preview_frame[:] = 0
+                        cv2.bitwise_and(image_BGR, image_BGR, dst=preview_frame, mask=analysis.preview_mask)
+                        preview_sequence.value += 1
+                    last_preview = now
+                    stats.record("preview", (time.perf_counter() - preview_start) * 1000)
+
+            pacer.wait(analysis.timestamp)
+    finally:
+        # Releases every key that is still being held
+        output_dispatcher.close()
+        image_processor.cap.release()
+        # Closes the camera straight away (instead of keeping it warm) as this process is finishing
+        default_manager.close_all()
+        if preview_memory is not None:
+            del preview_frame
+            preview_memory.close()
+            preview_memory.unlink()
+
+# Class used by the GUI to start, read from and stop the worker process
+class VisionWorker:
+
+    def __init__(self, settings, colour_ranges, keys):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings)
+
+        # "spawn" starts a fresh Python process, which is safer than copying a process that is running tkinter
+        context = multiprocessing.get_context("spawn")
+        self.stop_event = context.Event()
+        # Latest decision (see the positions at the top of this file)
+        self.decision = context.Array("d", 6)
+        # Increases by 1 every time a new preview frame is written
+        self.preview_sequence = context.Value("q", 0)
+        self.preview_enabled = context.Value("b", bool(self.settings["show_preview"]))
+        # Used by the worker to send the name of the shared memory
+        self.info_queue = context.Queue()
+        # Used by the worker to send a summary of its timings (see latency.py) every second
+        self.stats_queue = context.Queue()
+        self.last_stats = None
+
+        self.process = context.Process(target=run_worker, daemon=True,
+                                       args=(self.settings, colour_ranges, keys, self.stop_event, self.decision,
+                                             self.preview_sequence, self.preview_enabled, self.info_queue, self.stats_queue))
+
+        # Shared memory attached to once the worker has created it
+        self.preview_memory = None
+        self.preview_frame = None
+        self.last_sequence = 0
+
+    def start(self):
+        self.process.start()
+
+    # Function that returns True while the worker process is running
+    def is_alive(self):
+        return self.process.is_alive()
+
+    # Function that returns the latest decision as a dictionary, or None if no frames have been processed yet
+    def latest_decision(self):
+        with self.decision.get_lock():
+            values = list(self.decision)
+        if values[FRAME_NUMBER] == 0:
+            return None
+        return {
+            "frame_number": int(values[FRAME_NUMBER]),
+            "timestamp": values[TIMESTAMP],
+            "direction": DIRECTIONS[int(values[DIRECTION])],
+            "braking": bool(values[BRAKING]),
+            "accelerating": bool(values[ACCELERATING]),
+            "fps": values[FPS],
+        }
+
+    # Function that returns the newest summary of the worker's timings, or None if none has been sent yet
+    def latest_stats(self):
+        while True:
+            try:
+                self.last_stats = self.stats_queue.get_nowait()
+            except queue.Empty:
+                return self.last_stats
+
+    # Function that turns the worker's preview frames on or off
+    def set_preview_enabled(self, enabled):
+        self.preview_enabled.value = bool(enabled)
+
+    # Function that returns a copy of the newest preview frame, or None if there is no new one
+    def latest_preview(self):
+        if self.preview_memory is None:
+            try:
+                name, shape = self.info_queue.get_nowait()
+            except queue.Empty:
+                return None
+            self.preview_memory = shared_memory.SharedMemory(name=name)
+            self.preview_frame = np.ndarray(shape, dtype=np.uint8, buffer=self.preview_memory.buf)
+
+        with self.preview_sequence.get_lock():
+            if self.preview_sequence.value == self.last_sequence:
+                return None
+            self.last_sequence = self.preview_sequence.value
+            # Copied so the worker can write the next frame while this one is shown
+            return self.preview_frame.copy()
+
+    # Function that stops the worker process and detaches from the shared memory
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            # The worker handles SIGTERM by finishing its loop, so this still releases its keys
+            self.process.terminate()
+            self.process.join(timeout=2.0)
+        if self.preview_memory is not None:
+            self.preview_frame = None
+            self.preview_memory.close()
+            self.preview_memory = None